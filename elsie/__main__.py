@@ -0,0 +1,27 @@
+import argparse
+
+from .watch import watch
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(prog="elsie")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    watch_parser = commands.add_parser(
+        "watch", help="Render a presentation again whenever its source changes"
+    )
+    watch_parser.add_argument("script", help="Python script that renders the slides")
+    watch_parser.add_argument(
+        "--interval",
+        type=float,
+        default=0.5,
+        help="Interval (in seconds) between checks for changes",
+    )
+
+    args = parser.parse_args(args)
+    if args.command == "watch":
+        watch(args.script, args.interval)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,15 @@
+import hashlib
 import io
 import logging
+import os
 from typing import TYPE_CHECKING, BinaryIO, List, Union
 
 import lxml.etree as et
 from PIL import Image
 
 from ..render.backends.svg.utils import svg_size_to_pixels
-from ..render.image import create_image_data, get_image_steps
+from ..render.bitmap import downscale_bitmap, get_target_size
+from ..render.image import ImageFragments, get_image_steps
 from ..render.ora import convert_ora_to_svg
 from ..shapes import arrow
 from ..shapes.path import (
@@ -513,29 +516,31 @@ class BoxMixin:
             raise Exception("Unknown image type: {}".format(image_type))
 
     def _image_bitmap(self, source, scale: float, rotation: float):
-        if isinstance(source, str) or isinstance(source, bytes):
-            key = (source, "bitmap")
-            entry = self._get_box().slide.temp_cache.get(key)
+        slide = self._get_box().slide
+        dpi = slide.slides.image_dpi
+        if isinstance(source, str):
+            path = name = source
         else:
-            key = None
-            entry = None
+            # Images that are not read from a file are stored in the cache directory, so the
+            # painter does not keep them and they can be loaded again when they are evicted
+            raw_data = read_helper(source)
 
-        if entry is None:
-            data = read_helper(source)
-            img = Image.open(io.BytesIO(data))
-            mime = Image.MIME[img.format]
-            image_width, image_height = img.size
-            del img
-
-            if key is not None:
-                self._get_box().slide.temp_cache[key] = (
-                    image_width,
-                    image_height,
-                    mime,
-                    data,
-                )
-        else:
-            image_width, image_height, mime, data = entry
+            def constructor(_content, output, _data_type):
+                with open(output, "wb") as f:
+                    f.write(raw_data)
+
+            path = slide.fs_cache.ensure(raw_data, "bitmap", constructor)
+            name = type(source).__name__
+        key = (path, "bitmap")
+
+        def get_entry():
+            # The data is looked up when it is drawn, so the temp cache bounds its memory
+            return self._get_bitmap(key, path, dpi)
+
+        def load_raw_data():
+            return read_helper(path)
+
+        image_width, image_height = get_entry()[:2]
 
         self._get_box().layout.set_image_size_request(
             image_width * (scale or 1), image_height * (scale or 1)
@@ -549,7 +554,7 @@ class BoxMixin:
                     s = 0
                     logging.warning(
                         "Scale of image {} is 0, set scale explicitly or set at least one "
-                        "dimension for the parent box".format(source)
+                        "dimension for the parent box".format(name)
                     )
             else:
                 s = scale
@@ -558,30 +563,92 @@ class BoxMixin:
             h = image_height * s
             x = rect.x + (rect.width - w) / 2
             y = rect.y + (rect.height - h) / 2
+
+            _, _, mime, draw_data, digest = get_entry()
+            path = None
+            if dpi is not None and w > 0 and h > 0:
+                target = get_target_size(w, h, dpi)
+                if target[0] < image_width and target[1] < image_height:
+                    draw_data, path = self._downscaled_bitmap(
+                        digest, mime, target, load_raw_data
+                    )
             ctx.draw_bitmap(
-                x=x, y=y, width=w, height=h, data=data, mime=mime, rotation=rotation
+                x=x,
+                y=y,
+                width=w,
+                height=h,
+                data=draw_data,
+                mime=mime,
+                rotation=rotation,
+                path=path,
             )
 
         return self._create_simple_box_item(draw)
 
+    def _get_bitmap(self, key, source, dpi):
+        slide = self._get_box().slide
+        entry = slide.temp_cache.get(key)
+        if entry is None:
+            entry = self._load_bitmap(read_helper(source), dpi)
+            slide.temp_cache.set(key, entry, size=len(entry[3]))
+        return entry
+
+    def _load_bitmap(self, raw_data: bytes, dpi):
+        img = Image.open(io.BytesIO(raw_data))
+        mime = Image.MIME[img.format]
+        image_width, image_height = img.size
+        del img
+        digest = hashlib.sha1(raw_data).hexdigest() if dpi is not None else None
+        data = self._get_box().slide.slides.backend.prepare_bitmap(raw_data)
+        return image_width, image_height, mime, data, digest
+
+    def _downscaled_bitmap(self, digest, mime, target, load_raw_data):
+        """Returns the downscaled bitmap and the path of the file that contains it."""
+        slide = self._get_box().slide
+
+        def constructor(_content, output, _data_type):
+            with open(output, "wb") as f:
+                f.write(downscale_bitmap(load_raw_data(), *target))
+
+        cache_file = slide.fs_cache.ensure(
+            f"{digest}:{target[0]}x{target[1]}", mime.split("/")[1], constructor
+        )
+        key = (digest, "bitmap", target)
+        data = slide.temp_cache.get(key)
+        if data is None:
+            with open(cache_file, "rb") as f:
+                data = slide.slides.backend.prepare_bitmap(f.read())
+            slide.temp_cache.set(key, data, size=len(data))
+        return data, cache_file
+
     def _image_ora(
         self, filename, scale, fragments, show_begin, select_fragments, rotation
     ):
         key = (filename, "svg")
         slide = self._get_box().slide
-        if key not in slide.temp_cache:
 
+        def load():
             def constructor(_content, output, _data_type):
                 svg = convert_ora_to_svg(filename)
                 with open(output, "w") as f:
                     f.write(svg)
 
             cache_file = slide.fs_cache.ensure_by_file(filename, "svg", constructor)
-            self._get_box().slide.temp_cache[key] = et.parse(cache_file).getroot()
+            return self._load_svg_image(key, cache_file)
+
         return self._image_svg(
-            filename, scale, fragments, show_begin, select_fragments, rotation
+            filename, scale, fragments, show_begin, select_fragments, rotation, load
         )
 
+    def _load_svg_image(self, key, path: str) -> ImageFragments:
+        slide = self._get_box().slide
+        image = ImageFragments(
+            et.parse(path).getroot(), slide.slides.image_payloads, key[0]
+        )
+        # The size of the file is used as an estimate of the size of the parsed tree
+        slide.temp_cache.set(key, image, size=os.path.getsize(path))
+        return image
+
     def _image_svg(
         self,
         filename: str,
@@ -590,12 +657,23 @@ class BoxMixin:
         show_begin=1,
         select_fragments: List[int] = None,
         rotation: float = None,
+        load=None,
     ):
         key = (filename, "svg")
-        root = self._get_box().slide.temp_cache.get(key)
-        if root is None:
-            root = et.parse(filename).getroot()
-            self._get_box().slide.temp_cache[key] = root
+        temp_cache = self._get_box().slide.temp_cache
+        if load is None:
+
+            def load():
+                return self._load_svg_image(key, filename)
+
+        def get_fragments() -> ImageFragments:
+            image = temp_cache.get(key)
+            if image is None:
+                image = load()
+            return image
+
+        image_fragments = get_fragments()
+        root = image_fragments.root
 
         image_width = svg_size_to_pixels(root.get("width"))
         image_height = svg_size_to_pixels(root.get("height"))
@@ -614,15 +692,12 @@ class BoxMixin:
 
         self._get_box()._ensure_steps(show_begin - 1 + image_steps)
 
-        image_data = None
-
-        if image_steps == 1 and not select_fragments:
-            image_data = et.tostring(root).decode()
+        full_image = image_steps == 1 and not select_fragments
 
         def draw(ctx):
             rect = self._get_box().layout.rect
 
-            if image_data is None:
+            if not full_image:
                 step = ctx.step - show_begin + 1
                 if select_fragments is not None:
                     if 0 < step <= len(select_fragments):
@@ -633,11 +708,11 @@ class BoxMixin:
                         return
                 if step < 1:
                     return
-                data = create_image_data(root, step)
+                data = get_fragments().get(step)
             else:
                 if ctx.step < show_begin:
                     return
-                data = image_data
+                data = get_fragments().get_full()
 
             if scale is None:
                 s = scaler(rect, image_width, image_height)
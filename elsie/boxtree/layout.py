@@ -48,9 +48,14 @@ class Layout:
         self.horizontal = horizontal
 
         self.callbacks = None
+        self.parent = None
         self.children = []
         self.rect = None
 
+        # Cached results of `managed_children` and `compute_size_request`
+        self._managed_children = None
+        self._size_request = None
+
     def add(
         self,
         x=None,
@@ -85,13 +90,24 @@ class Layout:
             horizontal=horizontal,
         )
 
+        layout.parent = self
         if prepend:
             self.children.insert(0, layout)
         else:
             self.children.append(layout)
+        self._managed_children = None
+        self._invalidate_size_request()
 
         return layout
 
+    def _invalidate_size_request(self):
+        # The size request of a layout depends on the size requests of all its descendants.
+        # If a cached request is missing, all ancestors are already invalidated.
+        layout = self
+        while layout is not None and layout._size_request is not None:
+            layout._size_request = None
+            layout = layout.parent
+
     def add_callback(self, callback):
         if self.callbacks is None:
             self.callbacks = []
@@ -104,7 +120,11 @@ class Layout:
             return self._y is None
 
     def managed_children(self):
-        return [child for child in self.children if child.is_managed(self.horizontal)]
+        if self._managed_children is None:
+            self._managed_children = [
+                child for child in self.children if child.is_managed(self.horizontal)
+            ]
+        return self._managed_children
 
     def set_rect(self, rect):
         # assert self.rect is None
@@ -173,10 +193,12 @@ class Layout:
             child.set_rect(Rect(x, y, w, h))
 
     def compute_size_request(self):
-        minx, miny = self.min_children_size()
-        minx += self.p_left + self.p_right
-        miny += self.p_top + self.p_bottom
-        return self._width.ensure(minx), self._height.ensure(miny)
+        if self._size_request is None:
+            minx, miny = self.min_children_size()
+            minx += self.p_left + self.p_right
+            miny += self.p_top + self.p_bottom
+            self._size_request = self._width.ensure(minx), self._height.ensure(miny)
+        return self._size_request
 
     def min_children_size(self):
         managed_children = self.managed_children()
@@ -196,9 +218,11 @@ class Layout:
 
     def ensure_width(self, width):
         self._width = self._width.ensure(width + self.p_left + self.p_right)
+        self._invalidate_size_request()
 
     def ensure_height(self, height):
         self._height = self._height.ensure(height + self.p_top + self.p_bottom)
+        self._invalidate_size_request()
 
     def x(self, value):
         """Creates position on x-axis relative to the box."""
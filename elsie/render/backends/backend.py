@@ -1,5 +1,5 @@
 import os
-from typing import TYPE_CHECKING
+from typing import TYPE_CHECKING, Callable, List
 
 from ..render import RenderUnit
 
@@ -9,12 +9,49 @@ if TYPE_CHECKING:
 DEFAULT_CACHE_DIR = "./elsie-cache"
 
 
+class TextQuery:
+    """
+    Measurement of a text (its width, height or x position) requested from a backend.
+
+    The value is not available until the backend resolves its pending queries.
+    """
+
+    def __init__(self, method: str, parsed_text, style, styles, id_index=None):
+        assert method in ("width", "height", "x")
+        self.method = method
+        self.parsed_text = parsed_text
+        self.style = style
+        self.styles = styles
+        self.id_index = id_index
+        self.value = None
+        self.callbacks = None
+
+    def add_callback(self, callback):
+        """Calls `callback` with the value of the query when it is resolved."""
+        if self.value is not None:
+            callback(self.value)
+            return
+        if self.callbacks is None:
+            self.callbacks = []
+        self.callbacks.append(callback)
+
+    def set_value(self, value: float):
+        self.value = value
+        if self.callbacks:
+            callbacks = self.callbacks
+            self.callbacks = None
+            for callback in callbacks:
+                callback(value)
+
+
 class Backend:
     """Represents a rendering backend that can render Elsie primitives into PDF."""
 
     def __init__(self, cache_dir: str):
         self.dimensions = None
         self.cache_dir = os.path.abspath(cache_dir)
+        # Digests of values shared by pages that are fingerprinted during a single render
+        self.fingerprint_memo = {}
 
     def set_dimensions(self, width: int, height: int):
         self.dimensions = (width, height)
@@ -29,13 +66,43 @@ class Backend:
         return elsie_version
 
     def create_render_unit(
-        self, slide: "Slide", step: int, export_type: str
+        self, slide: "Slide", step: int, export_type: str, incremental=False
     ) -> RenderUnit:
         """
         Create a render unit that can export itself to PDF or PNG.
+
+        If `incremental` is True, the unit may skip rendering when the content of the page has
+        not changed since it was exported the last time.
         """
         raise NotImplementedError
 
+    def export_units(
+        self,
+        units: List[RenderUnit],
+        fs_cache,
+        export_type: str,
+        progress: Callable[[int], None] = None,
+    ) -> List[str]:
+        """
+        Exports the given render units and returns the exported files in the order of units.
+
+        `progress` is called with the number of already exported units.
+        """
+        outputs = []
+        for i, unit in enumerate(units):
+            outputs.append(unit.export(fs_cache, export_type))
+            if progress is not None:
+                progress(i + 1)
+        return outputs
+
+    def prepare_bitmap(self, data: bytes):
+        """
+        Returns the form of bitmap data that is passed to `RenderingContext.draw_bitmap`.
+
+        It is called once per image and the result is shared by all draws of the image.
+        """
+        return data
+
     def compute_text_width(self, parsed_text, style, styles, **kwargs) -> float:
         """
         Compute the width of the given text that would be rendered with the given style.
@@ -54,6 +121,29 @@ class Backend:
         """
         raise NotImplementedError
 
+    def resolve_queries(self, queries: List[TextQuery]):
+        """Computes values of the given text queries that are not resolved yet."""
+        queries = [query for query in queries if query.value is None]
+        if queries:
+            self.compute_text_queries(queries)
+
+    def compute_text_queries(self, queries: List[TextQuery]):
+        """
+        Computes and sets values of the given text queries.
+
+        Backends that can measure more texts at once should override this method.
+        """
+        for query in queries:
+            compute = getattr(self, f"compute_text_{query.method}")
+            query.set_value(
+                compute(
+                    query.parsed_text,
+                    query.style,
+                    query.styles,
+                    id_index=query.id_index,
+                )
+            )
+
     def prune_cache(self):
         pass
 
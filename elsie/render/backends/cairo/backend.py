@@ -1,9 +1,26 @@
+import multiprocessing
+import os
+import pickle
+import threading
+from concurrent.futures import (
+    Executor,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+    as_completed,
+)
+from typing import Dict, List, Optional
+
 from PIL import Image
 
+from ....text.textstyle import TextStyle
 from ....utils.cache import FsCache, get_cache_file_path
 from ....utils.geom import Rect
+from ....version import VERSION
 from ...render import RenderUnit
 from ..backend import DEFAULT_CACHE_DIR, Backend
+from ..querystore import QueryCache, QueryStore, query_digest
+from ..recording import RecordingContext
+from .fonts import get_text_versions
 from .rcontext import CairoRenderingContext
 
 
@@ -13,67 +30,304 @@ class CairoBackend(Backend):
     surface.
     """
 
-    def __init__(self, cache_dir: str = DEFAULT_CACHE_DIR):
+    def __init__(self, cache_dir: str = DEFAULT_CACHE_DIR, workers: int = 1):
+        """
+        Parameters
+        ----------
+        cache_dir: str
+            Cache directory for rendered pages and measured texts.
+        workers: int
+            Maximal number of processes that draw pages in parallel.
+            Processes are forked from the current process; pages are drawn in the current
+            process on platforms that do not support forking (e.g. Windows).
+        """
         super().__init__(cache_dir)
+        if workers < 1:
+            raise Exception("Number of workers has to be at least 1")
+        self.workers = workers
+        self._measure_ctx = None
+        self._extents_store = None
+        self._text_versions = None
+        self.query_cache = QueryCache()
+
+    def set_dimensions(self, width: int, height: int):
+        super().set_dimensions(width, height)
+        self._measure_ctx = None
 
-    def create_render_unit(self, slide, step: int, export_type: str) -> RenderUnit:
-        filename = get_cache_file_path(self.cache_dir, export_type)
-        ctx = CairoRenderingContext(
-            *self.dimensions,
-            filename=filename,
-            export_format=export_type,
-            viewbox=slide.view_box,
-            step=step,
-            debug_boxes=slide.debug_boxes
+    def get_version(self, elsie_version: str) -> str:
+        # Rendered pages depend on installed fonts as well
+        return "/".join(
+            [elsie_version]
+            + [
+                f"{name}-{version}"
+                for name, version in sorted(self.text_versions.items())
+            ]
         )
-        painters = slide._box.get_painters(ctx, 0)
+
+    @property
+    def text_versions(self) -> Dict[str, str]:
+        if self._text_versions is None:
+            self._text_versions = get_text_versions()
+        return self._text_versions
+
+    def create_render_unit(
+        self, slide, step: int, export_type: str, incremental=False
+    ) -> RenderUnit:
+        recording = RecordingContext(step, slide.debug_boxes)
+        painters = slide._box.get_painters(recording, 0)
         painters.sort(key=lambda painter: painter.z_level)
         for p in painters:
-            p.render(ctx)
-        return CairoRenderUnit(slide, step, ctx)
+            p.render(recording)
+        fingerprint = recording.fingerprint(
+            self.dimensions,
+            slide.view_box,
+            slide.debug_boxes,
+            memo=self.fingerprint_memo,
+        )
+        page = (
+            self.dimensions,
+            export_type,
+            slide.view_box,
+            step,
+            slide.debug_boxes,
+            recording.operations,
+        )
+        return CairoRenderUnit(slide, step, page, fingerprint)
+
+    def export_units(self, units, fs_cache, export_type, progress=None):
+        if self.workers == 1 or len(units) < 2 or not can_fork():
+            return super().export_units(units, fs_cache, export_type, progress)
+
+        outputs = [None] * len(units)
+        # Workers are forked, so they do not execute the presentation script again
+        processes = ProcessPoolExecutor(
+            max_workers=self.workers, mp_context=multiprocessing.get_context("fork")
+        )
+        with processes:
+            # All processes are forked before the threads below are started
+            processes.submit(int).result()
+            # Threads look up pages in the cache and wait for processes that draw missing
+            # pages
+            with ThreadPoolExecutor(max_workers=self.workers) as threads:
+                futures = {
+                    threads.submit(unit.export, fs_cache, export_type, processes): i
+                    for i, unit in enumerate(units)
+                }
+                for done, future in enumerate(as_completed(futures)):
+                    outputs[futures[future]] = future.result()
+                    if progress is not None:
+                        progress(done + 1)
+        return outputs
 
     def compute_text_width(
         self, parsed_text, style, styles, id_index=None, *args, **kwargs
     ) -> float:
-        return self._text_extents(parsed_text, style, styles, id_index=id_index).width
+        return self._text_query("width", parsed_text, style, styles, id_index)
 
     def compute_text_height(
         self, parsed_text, style, styles, id_index=None, *args, **kwargs
     ) -> float:
-        return self._text_extents(parsed_text, style, styles, id_index=id_index).height
+        return self._text_query("height", parsed_text, style, styles, id_index)
 
     def compute_text_x(
         self, parsed_text, style, styles, *args, id_index=None, **kwargs
     ) -> float:
-        return self._text_extents(parsed_text, style, styles, id_index=id_index).x
+        return self._text_query("x", parsed_text, style, styles, id_index)
+
+    def compute_text_queries(self, queries):
+        values = self.process_text_queries(
+            [
+                (
+                    query.method,
+                    query.parsed_text,
+                    query.style,
+                    query.styles,
+                    query.id_index,
+                )
+                for query in queries
+            ]
+        )
+        for query, value in zip(queries, values):
+            query.set_value(value)
+
+    def _text_query(self, method, parsed_text, style, styles, id_index):
+        return self.process_text_queries(
+            [(method, parsed_text, style, styles, id_index)]
+        )[0]
 
-    def _text_extents(self, parsed_text, style, styles, id_index=None) -> Rect:
-        ctx = CairoRenderingContext(*self.dimensions)
+    def process_text_queries(self, queries) -> List[float]:
+        """
+        Returns values of the given (method, parsed_text, style, styles, id_index) queries.
+
+        Values are looked up in memory and in the extents store; a text that is found in
+        neither of them is measured once and its extents answer all its queries.
+        """
+        keys = [(method, repr(text_extents_key(*args))) for method, *args in queries]
+        digests = [query_digest(method, data) for method, data in keys]
+        stored = self.extents_store.get_many(
+            digest for digest in digests if digest not in self.query_cache
+        )
+        values = []
+        for digest, (method, data), query in zip(digests, keys, queries):
+            value = self.query_cache.get(digest, method, data)
+            if value is None:
+                value = stored.get(digest)
+                if value is not None:
+                    self.query_cache.set(digest, method, data, value)
+                else:
+                    extents = self._measure_text(data, *query[1:])
+                    value = getattr(extents, method)
+            values.append(value)
+        return values
+
+    def _measure_text(self, data, parsed_text, style, styles, id_index) -> Rect:
+        ctx = self._measure_ctx
+        if ctx is None:
+            # A single context (with its surface and Pango context) measures all texts
+            ctx = CairoRenderingContext(*self.dimensions)
+            self._measure_ctx = ctx
         if id_index is None:
-            return ctx.compute_text_extents(parsed_text, style, styles)
-        return ctx.compute_subtext_extents(parsed_text, style, styles, id_index)
+            extents = ctx.compute_text_extents(parsed_text, style, styles)
+        else:
+            extents = ctx.compute_subtext_extents(parsed_text, style, styles, id_index)
+        for method in ("width", "height", "x"):
+            value = getattr(extents, method)
+            if value is not None:
+                digest = query_digest(method, data)
+                self.query_cache.set(digest, method, data, value)
+                self.extents_store.add(digest, value)
+        return extents
+
+    @property
+    def extents_store(self) -> QueryStore:
+        # The store is opened lazily, so that the cache file is created only when needed
+        if self._extents_store is None:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            versions = {"elsie": VERSION}
+            versions.update(self.text_versions)
+            self._extents_store = QueryStore(
+                os.path.join(self.cache_dir, "extents1.cache"), versions
+            )
+        return self._extents_store
+
+    def prune_cache(self):
+        self.query_cache.prune()
+        self.extents_store.prune(self.query_cache.digests())
+
+    def save_cache(self):
+        self.extents_store.flush()
+
+
+def text_extents_key(parsed_text, style: TextStyle, styles, id_index=None) -> tuple:
+    """
+    Returns a hashable key that identifies the extents of a text.
+
+    Only the styles that can be used by the text are a part of the key.
+    """
+    names = {"default"}
+    names.update(
+        value
+        for token, value in parsed_text
+        if token == "begin" and not value.startswith("#")
+    )
+    return (
+        tuple(parsed_text),
+        _style_key(style),
+        tuple((name, _style_key(styles.get(name))) for name in sorted(names)),
+        id_index,
+    )
+
+
+def _style_key(style: TextStyle):
+    if style is None:
+        return None
+    return tuple(getattr(style, slot) for slot in style.__slots__)
 
 
 class CairoRenderUnit(RenderUnit):
-    def __init__(self, slide, step, ctx: CairoRenderingContext):
+    """
+    Page recorded as a list of draw operations, which can be drawn in another process.
+
+    If `fingerprint` is set, the exported page is cached under it.
+    """
+
+    def __init__(self, slide, step, page: tuple, fingerprint: Optional[str] = None):
         super().__init__(slide, step)
-        self.ctx = ctx
-
-    def export(self, fs_cache: FsCache, export_type: str):
-        if export_type == "pdf":
-            self.ctx.surface.finish()
-            return self.ctx.filename
-        elif export_type == "png":
-            self.ctx.surface.flush()
-            # Force the image to be saved as RGBA
-            image = Image.frombuffer(
-                "RGBA",
-                (self.ctx.width, self.ctx.height),
-                self.ctx.surface.get_data(),
-                "raw",
-                "BGRA",
-                0,
-                1,
-            )
-            image.save(self.ctx.filename)
-            return self.ctx.filename
+        self.page = page
+        self.fingerprint = fingerprint
+
+    def export(self, fs_cache: FsCache, export_type: str, executor: Executor = None):
+        """
+        Exports the page; the page is drawn by `executor` if it is set and the page can be
+        pickled.
+        """
+
+        def constructor(_input_data, target, _data_type):
+            payload = self.get_payload() if executor is not None else None
+            if payload is not None:
+                executor.submit(render_pickled_page, target, payload).result()
+            else:
+                # Pages exported from multiple threads are drawn here one at a time
+                with _local_render_lock:
+                    render_page(target, *self.page)
+
+        if self.fingerprint is None:
+            target = get_cache_file_path(fs_cache.cache_dir, export_type)
+            constructor(None, target, export_type)
+            return target
+        return fs_cache.ensure(self.fingerprint, export_type, constructor)
+
+    def get_payload(self) -> Optional[bytes]:
+        """Returns the pickled page or None if some of its operations cannot be pickled."""
+        try:
+            return pickle.dumps(self.page, protocol=pickle.HIGHEST_PROTOCOL)
+        except (pickle.PicklingError, TypeError, AttributeError):
+            return None
+
+
+_local_render_lock = threading.Lock()
+
+
+def can_fork() -> bool:
+    return "fork" in multiprocessing.get_all_start_methods()
+
+
+def render_page(
+    filename, dimensions, export_type, viewbox, step, debug_boxes, operations
+) -> str:
+    """Draws recorded operations into a new page and exports it into `filename`."""
+    ctx = CairoRenderingContext(
+        *dimensions,
+        filename=filename,
+        export_format=export_type,
+        viewbox=viewbox,
+        step=step,
+        debug_boxes=debug_boxes,
+    )
+    for name, args, kwargs in operations:
+        getattr(ctx, name)(*args, **kwargs)
+    return export_context(ctx, export_type)
+
+
+def render_pickled_page(filename: str, payload: bytes) -> str:
+    return render_page(filename, *pickle.loads(payload))
+
+
+def export_context(ctx: CairoRenderingContext, export_type: str):
+    if export_type == "pdf":
+        ctx.surface.finish()
+        return ctx.filename
+    elif export_type == "png":
+        ctx.surface.flush()
+        # Force the image to be saved as RGBA
+        image = Image.frombuffer(
+            "RGBA",
+            (ctx.width, ctx.height),
+            ctx.surface.get_data(),
+            "raw",
+            "BGRA",
+            0,
+            1,
+        )
+        image.save(ctx.filename)
+        return ctx.filename
@@ -0,0 +1,64 @@
+import functools
+import hashlib
+import os
+from typing import List
+
+import cairocffi as cairo
+import pangocffi
+
+
+def get_font_dirs() -> List[str]:
+    """Returns directories that usually contain fonts and font configuration."""
+    home = os.path.expanduser("~")
+    data_home = os.environ.get("XDG_DATA_HOME") or os.path.join(home, ".local", "share")
+    config_home = os.environ.get("XDG_CONFIG_HOME") or os.path.join(home, ".config")
+    dirs = [
+        "/etc/fonts",
+        "/usr/share/fonts",
+        "/usr/local/share/fonts",
+        os.path.join(home, ".fonts"),
+        os.path.join(data_home, "fonts"),
+        os.path.join(config_home, "fontconfig"),
+        "/System/Library/Fonts",
+        "/Library/Fonts",
+        os.path.join(home, "Library", "Fonts"),
+    ]
+    windir = os.environ.get("WINDIR")
+    if windir:
+        dirs.append(os.path.join(windir, "Fonts"))
+    local_app_data = os.environ.get("LOCALAPPDATA")
+    if local_app_data:
+        dirs.append(os.path.join(local_app_data, "Microsoft", "Windows", "Fonts"))
+    return dirs
+
+
+@functools.lru_cache(maxsize=None)
+def get_fonts_digest() -> str:
+    """
+    Returns a digest of paths, sizes and modification times of installed fonts and of font
+    configuration files.
+
+    It changes when a font is installed, removed or updated. The font directories are walked
+    only once per process.
+    """
+    hasher = hashlib.sha1()
+    for font_dir in get_font_dirs():
+        for root, dirs, files in os.walk(font_dir):
+            dirs.sort()
+            for name in sorted(files):
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                hasher.update(f"{path}:{stat.st_size}:{stat.st_mtime_ns}\n".encode())
+    return hasher.hexdigest()
+
+
+def get_text_versions() -> dict:
+    """Returns versions of everything that affects the size of rendered texts."""
+    return {
+        "cairo": cairo.cairo_version_string(),
+        "pango": pangocffi.pango_version_string(),
+        "fonts": get_fonts_digest(),
+    }
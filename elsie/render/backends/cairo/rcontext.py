@@ -1,5 +1,6 @@
 import io
 import math
+import threading
 
 import cairocffi as cairo
 import lxml.etree as et
@@ -7,6 +8,7 @@ import pangocairocffi
 from PIL import Image
 
 from ....text.textstyle import TextStyle
+from ....utils.cache import LruCache
 from ....utils.geom import Rect, find_centroid
 from ..rcontext import RenderingContext
 from .draw import (
@@ -35,6 +37,35 @@ CAIRO_DPI = 72
 # DPI scaling: 72 (cairo) vs 96 (Inkscape)
 RESOLUTION_SCALE = CAIRO_DPI / TARGET_DPI
 
+# Maximal total size of decoded bitmaps that are kept for drawing them again
+BITMAP_CACHE_SIZE = 128 * 1024 * 1024
+
+_bitmap_cache = LruCache(BITMAP_CACHE_SIZE, sizeof=lambda entry: len(entry[1]))
+_bitmap_lock = threading.Lock()
+
+
+def get_bitmap_surface(data: bytes) -> cairo.ImageSurface:
+    """
+    Returns a surface with the decoded (premultiplied) bitmap.
+
+    Surfaces are shared by all draws of the same bitmap in the current process.
+    """
+    with _bitmap_lock:
+        entry = _bitmap_cache.get(data)
+    if entry is None:
+        image = Image.open(io.BytesIO(data))
+        if image.mode != "RGBA":
+            image = image.convert("RGBA")
+        # The surface does not copy the pixels, so they are kept with it
+        pixels = bytearray(image.tobytes("raw", "BGRa"))
+        surface = cairo.ImageSurface(
+            cairo.FORMAT_ARGB32, width=image.width, height=image.height, data=pixels
+        )
+        entry = (surface, pixels)
+        with _bitmap_lock:
+            _bitmap_cache.set(data, entry)
+    return entry[0]
+
 
 class CairoRenderingContext(RenderingContext):
     def __init__(
@@ -216,19 +247,14 @@ class CairoRenderingContext(RenderingContext):
 
     def draw_bitmap(self, x, y, width, height, data, rotation=None, **kwargs):
         assert isinstance(data, bytes)
-        image = Image.open(io.BytesIO(data))
-        if image.mode != "RGBA":
-            image = image.convert("RGBA")
-        img_width, img_height = image.width, image.height
-
-        data = bytearray(image.tobytes("raw", "BGRa"))
-        surface = cairo.ImageSurface(
-            cairo.FORMAT_ARGB32, width=img_width, height=img_height, data=data
-        )
-        surface.set_device_scale(img_width / width, img_height / height)
+        surface = get_bitmap_surface(data)
 
         center = (x + width / 2, y + height / 2)
-        with ctx_scope(self.ctx):
+        with ctx_scope(self.ctx), _bitmap_lock:
+            # The device scale of a shared surface is used only while it is painted
+            surface.set_device_scale(
+                surface.get_width() / width, surface.get_height() / height
+            )
             transform(self.ctx, center, rotation=rotation)
             self.ctx.set_source_surface(surface, x, y)
             self.ctx.move_to(x, y)
@@ -0,0 +1,179 @@
+import hashlib
+import sqlite3
+import sys
+from typing import Dict, Iterable, Optional, Tuple, Union
+
+# Minimal number of removed entries that makes the store file to be compacted
+VACUUM_THRESHOLD = 1000
+
+
+def query_digest(method: str, data: str) -> bytes:
+    return hashlib.sha1(f"{method}\n{data}".encode()).digest()
+
+
+class QueryStore:
+    """
+    Persistent store of query results, indexed by digests of (method, data) pairs.
+
+    Results are stored in a SQLite database, so they can be looked up without loading the
+    whole store and new results are written without rewriting the existing ones.
+    """
+
+    def __init__(self, path: str, versions: Dict[str, str]):
+        self.path = path
+        self.connection = sqlite3.connect(path)
+        self.pending = {}
+        with self.connection:
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT)"
+            )
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS queries (key BLOB PRIMARY KEY, value REAL)"
+            )
+            stored = dict(self.connection.execute("SELECT name, value FROM meta"))
+            if stored != versions:
+                for name, version in versions.items():
+                    if name in stored and stored[name] != version:
+                        print(f"{name.capitalize()} version changed; cache dropped")
+                        break
+                self.connection.execute("DELETE FROM queries")
+                self.connection.execute("DELETE FROM meta")
+                self.connection.executemany(
+                    "INSERT INTO meta VALUES (?, ?)", versions.items()
+                )
+        (self.count,) = self.connection.execute(
+            "SELECT COUNT(*) FROM queries"
+        ).fetchone()
+        # Keys that are kept by the next flush; None if entries are not pruned
+        self.used_keys = None
+
+    def get_many(self, keys: Iterable[bytes]) -> Dict[bytes, float]:
+        keys = list(keys)
+        result = {}
+        # Stay below the default limit of SQLite variables
+        for i in range(0, len(keys), 500):
+            chunk = keys[i : i + 500]
+            result.update(
+                self.connection.execute(
+                    "SELECT key, value FROM queries WHERE key IN ({})".format(
+                        ",".join("?" * len(chunk))
+                    ),
+                    chunk,
+                )
+            )
+        return result
+
+    def add(self, key: bytes, value: float):
+        """Adds a new entry; it is written to the disk by `flush`."""
+        self.pending[key] = value
+
+    def prune(self, used_keys: Iterable[bytes]):
+        """
+        Removes all entries except of the given ones.
+
+        Entries are removed from the disk by `flush`.
+        """
+        used_keys = set(used_keys)
+        self.pending = {
+            key: value for key, value in self.pending.items() if key in used_keys
+        }
+        self.used_keys = used_keys
+
+    def flush(self):
+        if not self.pending and self.used_keys is None:
+            return
+        with self.connection:
+            if self.pending:
+                # Results of the same query are equal, so stored entries are kept
+                self.count += self.connection.executemany(
+                    "INSERT OR IGNORE INTO queries VALUES (?, ?)",
+                    self.pending.items(),
+                ).rowcount
+            removed = 0
+            # All used entries are stored now, so the other ones are stale
+            if self.used_keys is not None and self.count > len(self.used_keys):
+                removed = self._remove_unused(self.used_keys)
+        self.pending = {}
+        self.used_keys = None
+        # Space of removed entries is reused by new entries; the file is shrunk only
+        # when most of it is unused
+        if removed > max(VACUUM_THRESHOLD, self.count):
+            self.connection.execute("VACUUM")
+
+    def _remove_unused(self, used_keys) -> int:
+        self.connection.execute(
+            "CREATE TEMP TABLE IF NOT EXISTS used (key BLOB PRIMARY KEY)"
+        )
+        self.connection.execute("DELETE FROM used")
+        self.connection.executemany(
+            "INSERT OR IGNORE INTO used VALUES (?)", ((key,) for key in used_keys)
+        )
+        removed = self.connection.execute(
+            "DELETE FROM queries WHERE key NOT IN (SELECT key FROM used)"
+        ).rowcount
+        self.connection.execute("DELETE FROM used")
+        self.count -= removed
+        return removed
+
+    def close(self):
+        self.connection.close()
+
+
+class QueryCache:
+    """
+    In-memory cache of query results indexed by digests of (method, data) pairs.
+
+    The query data is kept only to verify that two different queries do not share a
+    digest; the same entry is shared by the cache and by the set of used entries.
+    """
+
+    def __init__(self):
+        self.entries: Dict[bytes, Tuple[str, str, float]] = {}
+        self.used: Dict[bytes, Tuple[str, str, float]] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, digest: bytes):
+        return digest in self.entries
+
+    def get(self, digest: bytes, method: str, data: str) -> Optional[float]:
+        entry = self.entries.get(digest)
+        if entry is None or entry[0] != method or entry[1] != data:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.used[digest] = entry
+        return entry[2]
+
+    def set(self, digest: bytes, method: str, data: str, value: float):
+        entry = (method, data, value)
+        self.entries[digest] = entry
+        self.used[digest] = entry
+
+    def digests(self) -> Iterable[bytes]:
+        return self.entries.keys()
+
+    def prune(self):
+        """Keeps only entries that were used since the last pruning."""
+        self.entries = self.used
+        self.used = {}
+
+    def memory_usage(self) -> int:
+        """Returns an estimate of the memory (in bytes) taken by the cached entries."""
+        return sum(
+            sys.getsizeof(digest) + sys.getsizeof(entry) + sys.getsizeof(entry[1])
+            for digest, entry in self.entries.items()
+        )
+
+    def stats(self) -> Dict[str, Union[int, float]]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self.entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "memory": self.memory_usage(),
+        }
@@ -0,0 +1,141 @@
+import copy
+import hashlib
+from typing import Dict, List, Tuple, Union
+
+from .rcontext import RenderingContext
+
+LONG_STRING_LENGTH = 4096
+
+
+class UnsupportedFingerprint(Exception):
+    pass
+
+
+class RecordingContext(RenderingContext):
+    """
+    Rendering context that records draw operations instead of drawing them.
+
+    The recorded operations can be replayed into another rendering context and they can be
+    used to compute a fingerprint of the page without rendering it.
+    """
+
+    def __init__(self, step: int, debug_boxes: bool):
+        super().__init__(step, debug_boxes)
+        self.operations: List[Tuple[str, tuple, dict]] = []
+
+    def _record(self, name, args, kwargs):
+        # Painters may modify passed objects (e.g. rectangles) after drawing them
+        kwargs = {key: _snapshot(value) for key, value in kwargs.items()}
+        self.operations.append((name, _snapshot(args), kwargs))
+
+    def draw_rect(self, *args, **kwargs):
+        self._record("draw_rect", args, kwargs)
+
+    def draw_ellipse(self, *args, **kwargs):
+        self._record("draw_ellipse", args, kwargs)
+
+    def draw_polygon(self, *args, **kwargs):
+        self._record("draw_polygon", args, kwargs)
+
+    def draw_polyline(self, *args, **kwargs):
+        self._record("draw_polyline", args, kwargs)
+
+    def draw_path(self, *args, **kwargs):
+        self._record("draw_path", args, kwargs)
+
+    def draw_text(self, *args, **kwargs):
+        self._record("draw_text", args, kwargs)
+
+    def draw_bitmap(self, *args, **kwargs):
+        self._record("draw_bitmap", args, kwargs)
+
+    def draw_svg(self, *args, **kwargs):
+        self._record("draw_svg", args, kwargs)
+
+    def replay(self, ctx: RenderingContext):
+        """Draws all recorded operations into the given context."""
+        for name, args, kwargs in self.operations:
+            getattr(ctx, name)(*args, **kwargs)
+
+    def fingerprint(self, *extra, memo: Dict = None) -> Union[str, None]:
+        """
+        Returns a digest of the recorded operations (and of `extra` values).
+
+        Digests of long values (e.g. images) are stored in `memo`; a memo shared by multiple
+        pages computes the digest of a value that is drawn on all of them only once.
+
+        Returns None if some of the operations contain a value that cannot be fingerprinted.
+        """
+        hasher = hashlib.sha1()
+        if memo is None:
+            memo = {}
+        try:
+            _update_fingerprint(hasher, extra, memo)
+            for operation in self.operations:
+                _update_fingerprint(hasher, operation, memo)
+        except UnsupportedFingerprint:
+            return None
+        return "ops:" + hasher.hexdigest()
+
+
+def _snapshot(obj):
+    # Dictionaries (styles) are shared by all texts of a box and are not modified while
+    # painting, so they are not copied
+    if obj is None or isinstance(obj, (bool, int, float, str, bytes, dict)):
+        return obj
+    if type(obj) in (list, tuple):
+        return type(obj)(_snapshot(item) for item in obj)
+    return copy.copy(obj)
+
+
+def _update_fingerprint(hasher, obj, memo):
+    if isinstance(obj, str) and len(obj) > LONG_STRING_LENGTH:
+        # Long strings (e.g. encoded images) are usually shared by many operations
+        hasher.update(b"s%d:" % len(obj))
+        hasher.update(
+            _memoized_digest(obj, memo, lambda: hashlib.sha1(obj.encode()).digest())
+        )
+    elif obj is None or isinstance(obj, (bool, int, float, str)):
+        hasher.update(repr(obj).encode())
+    elif isinstance(obj, (list, tuple)):
+        hasher.update(b"[" if isinstance(obj, list) else b"(")
+        for item in obj:
+            _update_fingerprint(hasher, item, memo)
+            hasher.update(b",")
+        hasher.update(b"]")
+    elif isinstance(obj, (bytes, bytearray)):
+        hasher.update(b"b%d:" % len(obj))
+        hasher.update(_memoized_digest(obj, memo, lambda: hashlib.sha1(obj).digest()))
+    elif isinstance(obj, dict):
+
+        def compute():
+            h = hashlib.sha1()
+            for key in sorted(obj, key=repr):
+                _update_fingerprint(h, key, memo)
+                h.update(b":")
+                _update_fingerprint(h, obj[key], memo)
+                h.update(b",")
+            return h.digest()
+
+        hasher.update(b"{")
+        hasher.update(_memoized_digest(obj, memo, compute))
+    else:
+        cls = type(obj)
+        slots = getattr(cls, "__slots__", None)
+        if slots is not None:
+            values = tuple(getattr(obj, slot, None) for slot in slots)
+        elif hasattr(obj, "__dict__"):
+            values = tuple(sorted(vars(obj).items()))
+        else:
+            raise UnsupportedFingerprint(cls)
+        hasher.update(f"<{cls.__module__}.{cls.__qualname__}".encode())
+        _update_fingerprint(hasher, values, memo)
+
+
+def _memoized_digest(obj, memo, compute):
+    # Objects are kept in memo, so their ids cannot be reused while fingerprinting
+    entry = memo.get(id(obj))
+    if entry is None:
+        entry = (obj, compute())
+        memo[id(obj)] = entry
+    return entry[1]
@@ -1,19 +1,26 @@
-import json
+import base64
 import os
 import re
+import weakref
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from typing import Union
 
 from ....utils.sxml import Xml
 from ....version import VERSION
-from ...inkscape import InkscapeShell
+from ...inkscape import InkscapePool, InkscapeShell
 from ...render import SvgRenderUnit
 from ..backend import DEFAULT_CACHE_DIR, Backend
+from ..querystore import QueryCache, QueryStore, query_digest
+from ..recording import RecordingContext
 from .draw import draw_text
-from .query import compute_query
+from .images import SvgImageCache
+from .query import TARGET_ID, compute_queries
 from .rcontext import SvgRenderingContext
 
 VERSION_REGEX = re.compile(r"Inkscape\s+(\d+\..*)")
 
+QUERY_METHODS = {"width": "inkscape-w", "height": "inkscape-h", "x": "inkscape-x"}
+
 
 def detect_inkscape_bin():
     for path in ["/usr/bin/inkscape", "C:/Program Files/Inkscape/bin/inkscape.exe"]:
@@ -34,6 +41,9 @@ class InkscapeBackend(Backend):
         self,
         inkscape: Union[str, InkscapeShell] = None,
         cache_dir: str = DEFAULT_CACHE_DIR,
+        workers: int = 1,
+        link_images=False,
+        reuse_images=False,
     ):
         """
         Parameters
@@ -42,6 +52,16 @@ class InkscapeBackend(Backend):
             Either a path to the Inkscape binary or an instance of the InkscapeShell class.
         cache_dir: str
             Cache directory for caching SVG files.
+        workers: int
+            Maximal number of Inkscape processes that export slides and compute text queries
+            in parallel.
+        link_images: bool
+            If True, bitmaps are stored in the cache directory and SVG files passed to
+            Inkscape only link them, which makes the files smaller and faster to load.
+            SVG files that are returned or exported by Elsie always contain the bitmaps.
+        reuse_images: bool
+            If True, each distinct image is defined only once per slide and its occurrences
+            refer to it, which makes slides that repeat an image smaller.
         """
         super().__init__(cache_dir)
         if isinstance(inkscape, InkscapeShell):
@@ -51,6 +71,11 @@ class InkscapeBackend(Backend):
                 inkscape or os.environ.get("ELSIE_INKSCAPE") or detect_inkscape_bin()
             )
             self.inkscape = InkscapeShell(inkscape_bin)
+        if workers < 1:
+            raise Exception("Number of workers has to be at least 1")
+        self.inkscape_pool = InkscapePool(self.inkscape, workers)
+        # Additional Inkscape processes are closed together with the backend
+        weakref.finalize(self, self.inkscape_pool.close)
 
         self.inkscape_version = self.inkscape.get_version()
         match = VERSION_REGEX.search(self.inkscape_version)
@@ -65,26 +90,94 @@ class InkscapeBackend(Backend):
                     f"with Elsie. Please consider upgrading to Inkscape 1.0+."
                 )
 
-        self.query_cache = self._load_query_cache()
-        self.used_query_cache = {}
+        self.image_cache = SvgImageCache()
+        self.link_images = link_images
+        self.reuse_images = reuse_images
+        self._query_store = None
+        self.query_cache = QueryCache()
 
     def get_version(self, elsie_version: str) -> str:
         return f"{elsie_version}/{self.inkscape_version}"
 
-    def create_render_unit(self, slide, step, export_type):
-        ctx = SvgRenderingContext(slide, step, slide.debug_boxes)
+    def create_render_unit(self, slide, step, export_type, incremental=False):
+        if incremental:
+            return self._create_incremental_render_unit(slide, step)
+        ctx = self._create_rendering_context(slide, step)
         painters = slide._box.get_painters(ctx, 0)
         painters.sort(key=lambda painter: painter.z_level)
         for p in painters:
             p.render(ctx)
-        return SvgRenderUnit(slide, step, ctx.render(), self.inkscape)
+        return SvgRenderUnit(
+            slide,
+            step,
+            ctx.finish(),
+            self.inkscape_pool,
+            embed_images=self._embed_images(),
+        )
+
+    def _create_incremental_render_unit(self, slide, step):
+        recording = RecordingContext(step, slide.debug_boxes)
+        painters = slide._box.get_painters(recording, 0)
+        painters.sort(key=lambda painter: painter.z_level)
+        for p in painters:
+            p.render(recording)
+        fingerprint = recording.fingerprint(
+            slide.width, slide.height, slide.view_box, memo=self.fingerprint_memo
+        )
+
+        def render_svg():
+            ctx = self._create_rendering_context(slide, step)
+            recording.replay(ctx)
+            return ctx.finish()
+
+        return SvgRenderUnit(
+            slide,
+            step,
+            render_svg,
+            self.inkscape_pool,
+            fingerprint=fingerprint,
+            embed_images=self._embed_images(),
+        )
+
+    def _create_rendering_context(self, slide, step):
+        return SvgRenderingContext(
+            slide,
+            step,
+            slide.debug_boxes,
+            self.image_cache,
+            link_images=self.link_images,
+            reuse_images=self.reuse_images,
+        )
+
+    def _embed_images(self):
+        return self.image_cache.embed_files if self.link_images else None
+
+    def export_units(self, units, fs_cache, export_type, progress=None):
+        workers = self.inkscape_pool.size
+        if workers == 1 or len(units) < 2:
+            return super().export_units(units, fs_cache, export_type, progress)
+        outputs = [None] * len(units)
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {
+                executor.submit(unit.export, fs_cache, export_type): i
+                for i, unit in enumerate(units)
+            }
+            for done, future in enumerate(as_completed(futures)):
+                outputs[futures[future]] = future.result()
+                if progress is not None:
+                    progress(done + 1)
+        return outputs
+
+    def prepare_bitmap(self, data: bytes) -> str:
+        # Only the base64 encoded form is kept, because it is all that SVG needs
+        return base64.b64encode(data).decode("ascii")
 
     def prune_cache(self):
-        self.query_cache = self.used_query_cache
-        self.used_query_cache = {}
+        self.query_cache.prune()
+        self.query_store.prune(self.query_cache.digests())
 
     def save_cache(self):
-        self._save_query_cache(self.query_cache)
+        self.query_store.flush()
 
     def compute_text_width(self, parsed_text, style, styles, id_index=None):
         return self._text_query("inkscape-w", parsed_text, style, styles, id_index)
@@ -95,47 +188,110 @@ class InkscapeBackend(Backend):
     def compute_text_x(self, parsed_text, style, styles, id_index=None):
         return self._text_query("inkscape-x", parsed_text, style, styles, id_index)
 
+    def compute_text_queries(self, queries):
+        requests = [
+            (
+                QUERY_METHODS[query.method],
+                self._text_query_data(
+                    query.parsed_text, query.style, query.styles, query.id_index
+                ),
+            )
+            for query in queries
+        ]
+        for query, value in zip(queries, self.process_queries(requests)):
+            query.set_value(value)
+
     def _text_query(self, query, parsed_text, style, styles, id_index):
-        xml = Xml()
-        draw_text(xml, 0, 0, parsed_text, style, styles, id="target", id_index=id_index)
-        key = xml.to_string()
+        key = self._text_query_data(parsed_text, style, styles, id_index)
         return self.process_query(query, key)
 
+    def _text_query_data(self, parsed_text, style, styles, id_index):
+        xml = Xml()
+        draw_text(
+            xml, 0, 0, parsed_text, style, styles, id=TARGET_ID, id_index=id_index
+        )
+        return xml.to_string()
+
     def process_query(self, method: str, data: str):
-        key = (method, data)
-        value = self.query_cache.get(key)
-        if value is None:
-            value = compute_query(self.inkscape, method, data)
-            self.query_cache[key] = value
-        self.used_query_cache[key] = value
-        return value
+        return self.process_queries([(method, data)])[0]
+
+    def process_queries(self, queries):
+        """
+        Returns values of the given (method, data) queries.
+
+        Queries that are neither in memory nor in the query store are computed by Inkscape in
+        a single batch. Each distinct query is computed only once.
+        """
+        digests = [query_digest(method, data) for method, data in queries]
+        values = [
+            self.query_cache.get(digest, method, data)
+            for digest, (method, data) in zip(digests, queries)
+        ]
+        missing = {}
+        for digest, key, value in zip(digests, queries, values):
+            if value is None:
+                missing.setdefault(digest, key)
+        if not missing:
+            return values
+
+        resolved = self.query_store.get_many(missing)
+        for digest, value in resolved.items():
+            self.query_cache.set(digest, *missing[digest], value)
+        to_compute = [digest for digest in missing if digest not in resolved]
+        if to_compute:
+            computed = self._compute_queries([missing[digest] for digest in to_compute])
+            for digest, value in zip(to_compute, computed):
+                self.query_cache.set(digest, *missing[digest], value)
+                self.query_store.add(digest, value)
+                resolved[digest] = value
+        return [
+            resolved[digest] if value is None else value
+            for digest, value in zip(digests, values)
+        ]
+
+    def _compute_queries(self, queries):
+        """
+        Computes distinct (method, data) queries, splitting them among the Inkscape shells of
+        the pool.
+        """
+        # Queries of the same text fragment are kept together, so that the fragment is
+        # written into a single document
+        groups = {}
+        for key in queries:
+            groups.setdefault(key[1], []).append(key)
+        workers = min(self.inkscape_pool.size, len(groups))
+        if workers <= 1:
+            return self._compute_queries_chunk(queries)
+
+        chunks = [[] for _ in range(workers)]
+        for i, group in enumerate(groups.values()):
+            chunks[i % workers] += group
+        values = {}
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for chunk, chunk_values in zip(
+                chunks, executor.map(self._compute_queries_chunk, chunks)
+            ):
+                values.update(zip(chunk, chunk_values))
+        return [values[key] for key in queries]
+
+    def _compute_queries_chunk(self, queries):
+        with self.inkscape_pool.acquire() as inkscape:
+            return compute_queries(inkscape, queries)
 
     def _query_cache_file(self):
-        return os.path.join(self.cache_dir, "queries3.cache")
-
-    def _load_query_cache(self):
-        cache_file = self._query_cache_file()
-        if os.path.isfile(cache_file):
-            with open(cache_file) as f:
-                cache_config = json.load(f)
-            if cache_config.get("version") != VERSION:
-                print("Elsie version changed; cache dropped")
-                return {}
-            if cache_config.get("inkscape") != self.inkscape_version:
-                print("Inkscape version changed; cache dropped")
-                return {}
-            return dict(
-                (tuple(key), value) for key, value in cache_config.get("queries", ())
+        return os.path.join(self.cache_dir, "queries4.cache")
+
+    @property
+    def query_store(self) -> QueryStore:
+        # The store is opened lazily, so that the cache file is created only when needed
+        if self._query_store is None:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            # Remove the cache file of older Elsie versions
+            legacy_file = os.path.join(self.cache_dir, "queries3.cache")
+            if os.path.isfile(legacy_file):
+                os.remove(legacy_file)
+            self._query_store = QueryStore(
+                self._query_cache_file(),
+                {"elsie": VERSION, "inkscape": self.inkscape_version},
             )
-        else:
-            return {}
-
-    def _save_query_cache(self, cache):
-        cache_file = self._query_cache_file()
-        cache_config = {
-            "version": VERSION,
-            "inkscape": self.inkscape_version,
-            "queries": list(cache.items()),
-        }
-        with open(cache_file, "w") as f:
-            json.dump(cache_config, f)
+        return self._query_store
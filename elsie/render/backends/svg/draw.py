@@ -4,6 +4,8 @@ from ....text.textstyle import TextStyle
 from ....utils.geom import Rect, find_centroid
 from .utils import apply_rotation
 
+TEXT_ANCHORS = {"left": "start", "middle": "middle", "right": "end"}
+
 
 def set_font_from_style(xml, style):
     if style.font is not None:
@@ -60,9 +62,7 @@ def draw_text(
     if transform is not None:
         xml.set("transform", transform)
 
-    anchor = {"left": "start", "middle": "middle", "right": "end"}
-
-    xml.set("text-anchor", anchor[style.align])
+    xml.set("text-anchor", TEXT_ANCHORS[style.align])
 
     set_font_from_style(xml, style)
 
@@ -121,10 +121,9 @@ def draw_text(
     xml.close("text")
 
 
-def draw_bitmap(xml, x, y, width, height, mime, data, rotation=None, extra_args=None):
-    # TODO: improve
-    if not isinstance(data, str):
-        data = base64.b64encode(data).decode("ascii")
+def draw_bitmap(
+    xml, x, y, width, height, mime, data, rotation=None, extra_args=None, link=None
+):
     xml.element("image")
     xml.set("x", x)
     xml.set("y", y)
@@ -137,7 +136,12 @@ def draw_bitmap(xml, x, y, width, height, mime, data, rotation=None, extra_args=
     if extra_args is not None:
         for k, v in extra_args:
             xml.set(k, v)
-    xml.set("xlink:href", "data:{};base64,{}".format(mime, data), escape=False)
+    if link is not None:
+        xml.set("xlink:href", link)
+    else:
+        if not isinstance(data, str):
+            data = base64.b64encode(data).decode("ascii")
+        xml.set("xlink:href", "data:{};base64,{}".format(mime, data), escape=False)
     xml.close("image")
 
 
@@ -0,0 +1,103 @@
+import base64
+import hashlib
+import re
+import threading
+from typing import Tuple, Union
+
+from ....utils.cache import FsCache, LruCache
+from ....utils.sxml import escape_attribute
+
+# Maximal total length of encoded images that are kept in memory
+DEFAULT_IMAGE_CACHE_SIZE = 64 * 1024 * 1024
+
+LINK_REGEX = re.compile(r"xlink:href='([^']*)'")
+
+
+class SvgImageCache:
+    """
+    Images drawn into SVG pages, shared by all pages of a backend.
+
+    Each distinct image is base64 encoded only once and it gets an id derived from its
+    content, so that it can be defined once per page and referenced by the same id from
+    all pages.
+    """
+
+    def __init__(self, max_size=DEFAULT_IMAGE_CACHE_SIZE):
+        self.entries = LruCache(max_size, sizeof=lambda entry: len(entry[1]))
+        self.lock = threading.Lock()
+        # Links (as they are written in SVG) to files returned by `get_bitmap_file`
+        self.linked_files = {}
+
+    def get_bitmap(self, mime: str, data: Union[bytes, str]) -> Tuple[str, str]:
+        """Returns an id and a base64 encoded form of the given bitmap."""
+        key = (mime, data)
+        with self.lock:
+            entry = self.entries.get(key)
+        if entry is None:
+            if isinstance(data, str):
+                encoded = data
+            else:
+                encoded = base64.b64encode(data).decode("ascii")
+            entry = (_content_id("image", encoded.encode()), encoded)
+            with self.lock:
+                self.entries.set(key, entry)
+        return entry
+
+    def get_bitmap_file(
+        self, mime: str, data: Union[bytes, str], fs_cache: FsCache, path: str = None
+    ) -> str:
+        """
+        Returns a path to a file in the cache directory that contains the given bitmap.
+
+        If `path` is set, it is a file that already contains the bitmap and it is used
+        instead of creating a new one.
+        """
+        if path is None:
+            image_id, encoded = self.get_bitmap(mime, data)
+
+            def constructor(_content, output, _data_type):
+                with open(output, "wb") as f:
+                    f.write(base64.b64decode(encoded))
+
+            path = fs_cache.ensure(image_id, mime.split("/")[1], constructor)
+        with self.lock:
+            self.linked_files[escape_attribute(path)] = (mime, path)
+        return path
+
+    def embed_files(self, svg: str) -> str:
+        """Replaces links to files returned by `get_bitmap_file` by the data of the files."""
+
+        def replace(match):
+            entry = self.linked_files.get(match.group(1))
+            if entry is None:
+                return match.group(0)
+            mime, path = entry
+            return "xlink:href='data:{};base64,{}'".format(mime, self._read_file(path))
+
+        return LINK_REGEX.sub(replace, svg)
+
+    def _read_file(self, path: str) -> str:
+        key = ("file", path)
+        with self.lock:
+            entry = self.entries.get(key)
+        if entry is None:
+            with open(path, "rb") as f:
+                entry = (path, base64.b64encode(f.read()).decode("ascii"))
+            with self.lock:
+                self.entries.set(key, entry)
+        return entry[1]
+
+    def get_svg_id(self, svg: str) -> str:
+        """Returns an id of the given SVG image."""
+        key = ("svg", svg)
+        with self.lock:
+            entry = self.entries.get(key)
+        if entry is None:
+            entry = (_content_id("svg", svg.encode()), svg)
+            with self.lock:
+                self.entries.set(key, entry)
+        return entry[0]
+
+
+def _content_id(prefix: str, data: bytes) -> str:
+    return "elsie-{}-{}".format(prefix, hashlib.sha1(data).hexdigest()[:20])
@@ -1,19 +1,43 @@
+from typing import List, Tuple
+
 from ....utils.sxml import Xml
 from ...inkscape import InkscapeShell
 from .utils import svg_begin, svg_end
 
+QUERY_COMMANDS = {
+    "inkscape-w": "query-width",
+    "inkscape-h": "query-height",
+    "inkscape-x": "query-x",
+}
+
+TARGET_ID = "target"
+
 
 def compute_query(inkscape: InkscapeShell, method: str, data: str):
+    return compute_queries(inkscape, [(method, data)])[0]
+
+
+def compute_queries(inkscape: InkscapeShell, queries: List[Tuple[str, str]]):
+    """
+    Computes all (method, data) queries using a single SVG document.
+
+    Each distinct `data` fragment is written into the document only once and its target
+    element gets a unique id.
+    """
     xml = Xml()
     svg_begin(xml)
-    xml.raw_text(data)
+    ids = {}
+    commands = []
+    for method, data in queries:
+        command = QUERY_COMMANDS.get(method)
+        if command is None:
+            raise Exception("Invalid method: " + repr(method))
+        target = ids.get(data)
+        if target is None:
+            target = f"{TARGET_ID}-{len(ids)}"
+            ids[data] = target
+            # Text content is escaped by Xml, so the attribute cannot occur inside text
+            xml.raw_text(data.replace(f" id='{TARGET_ID}'", f" id='{target}'"))
+        commands.append((command, target))
     svg_end(xml)
-
-    if method == "inkscape-w":
-        return inkscape.get_width(xml.to_string(), "target")
-    elif method == "inkscape-h":
-        return inkscape.get_height(xml.to_string(), "target")
-    elif method == "inkscape-x":
-        return inkscape.get_x(xml.to_string(), "target")
-    else:
-        raise Exception("Invalid method: " + repr(method))
+    return inkscape.run_queries(xml, commands)
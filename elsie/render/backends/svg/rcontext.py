@@ -10,14 +10,34 @@ from .draw import (
     draw_rect,
     draw_text,
 )
+from .images import SvgImageCache
 from .utils import svg_begin, svg_end
 
 
 class SvgRenderingContext(RenderingContext):
-    def __init__(self, slide, step, debug_boxes):
+    def __init__(
+        self,
+        slide,
+        step,
+        debug_boxes,
+        image_cache: SvgImageCache = None,
+        link_images=False,
+        reuse_images=False,
+    ):
+        """
+        If `link_images` is True, bitmaps are stored in the cache directory and they are
+        linked from the SVG instead of being embedded into it.
+
+        If `reuse_images` is True, each distinct image is defined only once per page in
+        <defs> and it is drawn by <use> elements.
+        """
         super().__init__(step, debug_boxes)
         self.xml = Xml()
         svg_begin(self.xml, slide.width, slide.height, slide.view_box)
+        self.image_cache = image_cache if image_cache is not None else SvgImageCache()
+        self.fs_cache = slide.fs_cache if link_images else None
+        self.reuse_images = reuse_images
+        self.defined_images = set()
 
     def draw_rect(self, rect: Rect, rx=None, ry=None, rotation=None, **kwargs):
         draw_rect(self.xml, rect, rx=rx, ry=ry, rotation=rotation, **kwargs)
@@ -69,14 +89,55 @@ class SvgRenderingContext(RenderingContext):
             **kwargs,
         )
 
-    def draw_bitmap(self, *args, **kwargs):
-        draw_bitmap(self.xml, *args, **kwargs)
+    def draw_bitmap(
+        self, x, y, width, height, mime, data, rotation=None, path=None, **kwargs
+    ):
+        image_id, encoded = self.image_cache.get_bitmap(mime, data)
+        if not self.reuse_images:
+            draw_bitmap(
+                self.xml,
+                x,
+                y,
+                width,
+                height,
+                mime,
+                encoded,
+                rotation=rotation,
+                link=self._bitmap_link(mime, data, path),
+            )
+            return
+
+        if image_id not in self.defined_images:
+            self.defined_images.add(image_id)
+            self.xml.element("defs")
+            # The image is defined with a unit size and scaled by <use>
+            draw_bitmap(
+                self.xml,
+                0,
+                0,
+                1,
+                1,
+                mime,
+                encoded,
+                extra_args=(("id", image_id), ("preserveAspectRatio", "none")),
+                link=self._bitmap_link(mime, data, path),
+            )
+            self.xml.close("defs")
 
-    def draw_svg(self, svg, x, y, scale, rotation=None, rotation_center=None, **kwargs):
-        xml = Xml()
-        xml.element("g")
         transform = []
+        if rotation:
+            transform.append(f"rotate({rotation} {x + width / 2} {y + height / 2})")
+        transform.append(f"translate({x}, {y})")
+        transform.append(f"scale({width}, {height})")
+        self._draw_use(image_id, transform)
 
+    def _bitmap_link(self, mime, data, path):
+        if self.fs_cache is None:
+            return None
+        return self.image_cache.get_bitmap_file(mime, data, self.fs_cache, path)
+
+    def draw_svg(self, svg, x, y, scale, rotation=None, rotation_center=None, **kwargs):
+        transform = []
         # First scale, then rotate (https://gamedev.stackexchange.com/a/16721/73578).
         # Applied in opposite order in transform.
         if rotation is not None:
@@ -88,12 +149,33 @@ class SvgRenderingContext(RenderingContext):
         transform.append(f"translate({x}, {y})")
         if scale != 1.0:
             transform.append(f"scale({scale})")
-        xml.set("transform", " ".join(transform))
-        xml.raw_text(svg)
-        xml.close("g")
-        xml_string = xml.to_string()
-        self.xml.raw_text(xml_string)
 
-    def render(self) -> str:
+        if not self.reuse_images:
+            self.xml.element("g")
+            self.xml.set("transform", " ".join(transform))
+            self.xml.raw_text(svg)
+            self.xml.close("g")
+            return
+
+        svg_id = self.image_cache.get_svg_id(svg)
+        if svg_id not in self.defined_images:
+            self.defined_images.add(svg_id)
+            self.xml.element("defs")
+            self.xml.element("g")
+            self.xml.set("id", svg_id)
+            self.xml.raw_text(svg)
+            self.xml.close("g")
+            self.xml.close("defs")
+        self._draw_use(svg_id, transform)
+
+    def _draw_use(self, ref_id, transform):
+        self.xml.element("use")
+        self.xml.set("xlink:href", "#" + ref_id)
+        self.xml.set("transform", " ".join(transform))
+        self.xml.close("use")
+
+    def finish(self) -> Xml:
+        """Closes the document and returns it without joining it into a string."""
         svg_end(self.xml)
-        return self.xml.to_string()
+        self.xml.compact()
+        return self.xml
@@ -0,0 +1,30 @@
+import io
+import math
+from typing import Tuple
+
+from PIL import Image
+
+# Number of SVG user units (pixels) per inch
+SVG_DPI = 96
+
+
+def get_target_size(width: float, height: float, dpi: int) -> Tuple[int, int]:
+    """Returns the size in pixels of a bitmap drawn into the given size with the given DPI."""
+    scale = dpi / SVG_DPI
+    return max(1, math.ceil(width * scale)), max(1, math.ceil(height * scale))
+
+
+def downscale_bitmap(data: bytes, width: int, height: int) -> bytes:
+    """Resamples a PNG or JPEG image to the given size, keeping its format."""
+    image = Image.open(io.BytesIO(data))
+    image_format = image.format
+    if image.mode not in ("RGB", "RGBA", "L", "LA"):
+        image = image.convert("RGBA" if image_format == "PNG" else "RGB")
+    image = image.resize((width, height), Image.LANCZOS)
+
+    output = io.BytesIO()
+    if image_format == "JPEG":
+        image.save(output, "JPEG", quality=90)
+    else:
+        image.save(output, "PNG", optimize=True)
+    return output.getvalue()
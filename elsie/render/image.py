@@ -3,6 +3,7 @@ from copy import deepcopy
 import lxml.etree as et
 
 from ..slides.show import ShowInfo
+from ..utils.cache import LruCache
 
 
 def parse_show_info_from_label(element):
@@ -35,3 +36,44 @@ def create_image_data(root, step):
     for element, child in hidden:
         element.remove(child)
     return et.tostring(root).decode()
+
+
+class ImageFragments:
+    """
+    Serialized fragments of an SVG image.
+
+    Fragments are stored in a cache of serialized payloads shared by all images of a slide
+    deck. Steps that show the same set of labeled elements share a single fragment, so
+    each distinct fragment is built only once (unless it is evicted from the cache).
+    """
+
+    def __init__(self, root, payloads: LruCache, key):
+        self.root = root
+        self.payloads = payloads
+        self.key = key
+        self.show_infos = []
+        for element in root.iter():
+            show_info = parse_show_info_from_label(element)
+            if show_info is not None:
+                self.show_infos.append(show_info)
+
+    def get(self, step: int) -> str:
+        """Returns the image with elements that are not visible in `step` removed."""
+        key = (
+            self.key,
+            tuple(show_info.is_visible(step) for show_info in self.show_infos),
+        )
+        data = self.payloads.get(key)
+        if data is None:
+            data = create_image_data(self.root, step)
+            self.payloads.set(key, data)
+        return data
+
+    def get_full(self) -> str:
+        """Returns the whole image."""
+        key = (self.key, None)
+        data = self.payloads.get(key)
+        if data is None:
+            data = et.tostring(self.root).decode()
+            self.payloads.set(key, data)
+        return data
@@ -1,23 +1,69 @@
 import contextlib
 import logging
 import os
+import queue
+import shutil
 import subprocess
 import tempfile
+import threading
+import weakref
+from typing import Union
+
+from ..utils.sxml import Xml
+
+# Memory-backed directories that are preferred for files passed to Inkscape
+MEMORY_TEMP_DIRS = ("/dev/shm",)
+
+
+def get_input_temp_dir() -> str:
+    """Returns a directory for Inkscape input files, preferring a memory-backed one."""
+    for path in MEMORY_TEMP_DIRS:
+        if os.path.isdir(path) and os.access(path, os.W_OK | os.X_OK):
+            return path
+    return tempfile.gettempdir()
 
 
 @contextlib.contextmanager
-def svg_file_input(inkscape, svg: str, binary=False):
-    with tempfile.NamedTemporaryFile("wb" if binary else "w", suffix=".svg") as f:
-        f.write(svg)
-        f.flush()
-        inkscape.run_command(f"file-open:{f.name}")
-        yield
-        inkscape.run_command("file-close")
+def svg_file_input(inkscape, svg: Union[str, bytes, Xml]):
+    # Each shell opens a single document at a time, so it always reuses the same file
+    path = inkscape.input_path
+    if isinstance(svg, bytes):
+        file = open(path, "wb")
+    else:
+        file = open(path, "w", encoding="utf-8")
+    with file as f:
+        if isinstance(svg, Xml):
+            svg.write_to(f)
+        else:
+            f.write(svg)
+    inkscape.run_command(f"file-open:{path}")
+    yield
+    inkscape.run_command("file-close")
 
 
 class InkscapeShell:
-    def __init__(self, inkscape_bin: str, text_to_path=False):
+    def __init__(self, inkscape_bin: str, text_to_path=False, temp_dir: str = None):
+        """
+        Parameters
+        ----------
+        inkscape_bin: str
+            Path to the Inkscape binary.
+        text_to_path: bool
+            If True, texts are converted to paths in exported files.
+        temp_dir: str
+            Directory where the shell creates its input files.
+            By default, a memory-backed directory (/dev/shm) is used if it is available.
+        """
+        self.inkscape_bin = inkscape_bin
         self.text_to_path = text_to_path
+        self.temp_dir = temp_dir
+        self.input_dir = tempfile.mkdtemp(
+            prefix="elsie-inkscape-", dir=temp_dir or get_input_temp_dir()
+        )
+        self.input_path = os.path.join(self.input_dir, "input.svg")
+        self._remove_input_dir = weakref.finalize(
+            self, shutil.rmtree, self.input_dir, True
+        )
         self.process = subprocess.Popen(
             [inkscape_bin, "--shell"],
             stdout=subprocess.PIPE,
@@ -30,7 +76,15 @@ class InkscapeShell:
         self.run_command("file-close")
 
     def close(self):
+        # The shell exits when its input is closed
+        self.process.stdin.close()
         self.process.stdout.close()
+        try:
+            self.process.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+            self.process.wait()
+        self._remove_input_dir()
 
     def wait_for_prompt(self):
         chars = []
@@ -49,7 +103,7 @@ class InkscapeShell:
                 chars.append(character)
 
     def convert_to_pdf(self, source, target: str, type: str):
-        with svg_file_input(self, source, binary=True):
+        with svg_file_input(self, source):
             self.run_command("export-area-page")
             # Inkscape 1.1
             self.run_command("export-png-color-mode:RGBA_8")
@@ -70,16 +124,28 @@ class InkscapeShell:
         return self.run_query(svg, "query-x", id)
 
     def run_query(self, svg: str, query: str, id: str):
+        return self.run_queries(svg, [(query, id)])[0]
+
+    def run_queries(self, svg: Union[str, Xml], queries):
+        """
+        Runs a list of (query, id) pairs on the given SVG document.
+
+        The document is opened only once for all queries.
+        """
+        values = []
         with svg_file_input(self, svg):
-            self.run_command(f"select:{id}")
-            value = self.run_command(query)
-            try:
-                return float(value)
-            except ValueError:
-                raise Exception(
-                    f"Inkscape query executed ({query}) and should return "
-                    f"float but returned {repr(value)}"
-                )
+            for query, id in queries:
+                self.run_command("select-clear")
+                self.run_command(f"select:{id}")
+                value = self.run_command(query)
+                try:
+                    values.append(float(value))
+                except ValueError:
+                    raise Exception(
+                        f"Inkscape query executed ({query}) and should return "
+                        f"float but returned {repr(value)}"
+                    )
+        return values
 
     def run_command(self, command: str):
         logging.debug(f"Sending {command} to Inkscape")
@@ -94,7 +160,63 @@ class InkscapeShell:
         return self.run_command("inkscape-version")
 
 
-def export_by_inkscape(inkscape: InkscapeShell, source: str, target: str, type: str):
+class InkscapePool:
+    """
+    Pool of Inkscape shells that can be used concurrently from multiple threads.
+
+    The pool starts with a single shell; additional shells are spawned on demand, up to `size`
+    shells in total.
+    """
+
+    def __init__(self, shell: InkscapeShell, size=1):
+        assert size >= 1
+        self.size = size
+        self.shells = [shell]
+        self.free_shells = queue.Queue()
+        self.free_shells.put(shell)
+        self.lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def acquire(self):
+        shell = None
+        with self.lock:
+            try:
+                shell = self.free_shells.get_nowait()
+            except queue.Empty:
+                if len(self.shells) < self.size:
+                    primary = self.shells[0]
+                    shell = InkscapeShell(
+                        primary.inkscape_bin, primary.text_to_path, primary.temp_dir
+                    )
+                    self.shells.append(shell)
+        if shell is None:
+            shell = self.free_shells.get()
+        try:
+            yield shell
+        finally:
+            self.free_shells.put(shell)
+
+    def convert_to_pdf(self, source, target: str, type: str):
+        with self.acquire() as shell:
+            shell.convert_to_pdf(source, target, type)
+
+    def close(self):
+        """
+        Closes all shells except the first one. Shells cannot be acquired while the pool is
+        being closed.
+        """
+        with self.lock:
+            while not self.free_shells.empty():
+                self.free_shells.get()
+            for shell in self.shells[1:]:
+                shell.close()
+            self.shells = self.shells[:1]
+            self.free_shells.put(self.shells[0])
+
+
+def export_by_inkscape(
+    inkscape: InkscapeShell, source: Union[str, bytes, Xml], target: str, type: str
+):
     inkscape.convert_to_pdf(source, target, type)
     if not os.path.isfile(target):
         raise Exception(
@@ -1,3 +1,5 @@
+import hashlib
+import io
 import subprocess
 
 
@@ -39,9 +41,179 @@ class PyPdfMerger:
             self.inner.write(f)
 
 
+class StreamingPdfMerger:
+    """
+    Merges PDF files by copying their pages directly into the output file.
+
+    Only a single input file is open at a time and copied objects are written out
+    immediately, so the memory usage does not grow with the number of pages.
+    Objects with the same content (e.g. fonts or images shared by several slides) are
+    written only once.
+    """
+
+    def __init__(self):
+        self.filenames = []
+
+    def append(self, filename):
+        self.filenames.append(filename)
+
+    def write(self, output, debug):
+        from PyPDF2 import PdfFileReader
+
+        with open(output, "wb") as f:
+            writer = PdfStreamWriter(f)
+            for filename in self.filenames:
+                with open(filename, "rb") as input:
+                    writer.add_pages(PdfFileReader(input, strict=False))
+            writer.finish()
+
+
+class PdfStreamWriter:
+    CATALOG_ID = 1
+    PAGES_ID = 2
+
+    def __init__(self, stream):
+        self.stream = stream
+        # Offsets of written objects, indexed by object numbers
+        self.offsets = [None, None, None]
+        self.page_ids = []
+        self.written = {}
+        self.copied = None
+        self.in_progress = None
+        stream.write(b"%PDF-1.5\n%\xe2\xe3\xcf\xd3\n")
+
+    def add_pages(self, reader):
+        from PyPDF2.generic import DictionaryObject, IndirectObject, NameObject
+
+        # Object numbers are valid only within a single input file
+        self.copied = {}
+        self.in_progress = {}
+        pages = [reader.getPage(i) for i in range(reader.getNumPages())]
+        page_ids = []
+        for page in pages:
+            page_id = self._reserve()
+            if page.indirectRef is not None:
+                ref = page.indirectRef
+                self.copied[(ref.idnum, ref.generation)] = page_id
+            page_ids.append(page_id)
+
+        for page, page_id in zip(pages, page_ids):
+            page = DictionaryObject(
+                (key, value) for key, value in page.items() if key != "/Parent"
+            )
+            page = self._copy(page)
+            page[NameObject("/Parent")] = IndirectObject(self.PAGES_ID, 0, None)
+            self._write(page, page_id)
+        self.page_ids += page_ids
+        self.copied = None
+        self.in_progress = None
+
+    def finish(self):
+        from PyPDF2.generic import (
+            ArrayObject,
+            DictionaryObject,
+            IndirectObject,
+            NameObject,
+            NumberObject,
+        )
+
+        pages = DictionaryObject()
+        pages[NameObject("/Type")] = NameObject("/Pages")
+        pages[NameObject("/Kids")] = ArrayObject(
+            IndirectObject(page_id, 0, None) for page_id in self.page_ids
+        )
+        pages[NameObject("/Count")] = NumberObject(len(self.page_ids))
+        self._write(pages, self.PAGES_ID)
+
+        catalog = DictionaryObject()
+        catalog[NameObject("/Type")] = NameObject("/Catalog")
+        catalog[NameObject("/Pages")] = IndirectObject(self.PAGES_ID, 0, None)
+        self._write(catalog, self.CATALOG_ID)
+
+        assert all(offset is not None for offset in self.offsets[1:])
+        xref_offset = self.stream.tell()
+        self.stream.write(b"xref\n0 %d\n0000000000 65535 f \n" % len(self.offsets))
+        for offset in self.offsets[1:]:
+            self.stream.write(b"%010d 00000 n \n" % offset)
+        self.stream.write(
+            b"trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n"
+            % (len(self.offsets), self.CATALOG_ID, xref_offset)
+        )
+
+    def _reserve(self):
+        self.offsets.append(None)
+        return len(self.offsets) - 1
+
+    def _copy(self, obj):
+        """
+        Returns a copy of the given object where references point to objects in the
+        output. Referenced objects are copied and written into the output first.
+        """
+        from PyPDF2.generic import (
+            ArrayObject,
+            DictionaryObject,
+            IndirectObject,
+            StreamObject,
+        )
+
+        if isinstance(obj, IndirectObject):
+            key = (obj.idnum, obj.generation)
+            obj_id = self.copied.get(key)
+            if obj_id is None:
+                if key in self.in_progress:
+                    # A reference cycle; the object gets a number before it is written
+                    obj_id = self.in_progress[key]
+                    if obj_id is None:
+                        obj_id = self._reserve()
+                        self.in_progress[key] = obj_id
+                else:
+                    self.in_progress[key] = None
+                    value = self._copy(obj.getObject())
+                    obj_id = self._write(value, self.in_progress.pop(key))
+                    self.copied[key] = obj_id
+            return IndirectObject(obj_id, 0, None)
+        if isinstance(obj, DictionaryObject):
+            if isinstance(obj, StreamObject):
+                result = type(obj)()
+                result._data = obj._data
+            else:
+                result = DictionaryObject()
+            for key, value in obj.items():
+                result[key] = self._copy(value)
+            return result
+        if isinstance(obj, ArrayObject):
+            return ArrayObject(self._copy(value) for value in obj)
+        return obj
+
+    def _write(self, obj, obj_id=None):
+        """
+        Writes an object into the output and returns its number.
+
+        If no number is given and an object with the same content was already written,
+        its number is returned instead.
+        """
+        data = io.BytesIO()
+        obj.writeToStream(data, None)
+        data = data.getvalue()
+        if obj_id is None:
+            digest = hashlib.sha1(data).digest()
+            obj_id = self.written.get(digest)
+            if obj_id is not None:
+                return obj_id
+            obj_id = self._reserve()
+            self.written[digest] = obj_id
+        self.offsets[obj_id] = self.stream.tell()
+        self.stream.write(b"%d 0 obj\n" % obj_id)
+        self.stream.write(data)
+        self.stream.write(b"\nendobj\n")
+        return obj_id
+
+
 def get_pdf_merger_by_name(name):
     if name == "pypdf":
         return PyPdfMerger()
+    if name == "pypdf-stream":
+        return StreamingPdfMerger()
     if name == "pdfunite":
         return ExternalMerger(("pdfunite", "INPUTS", "OUTPUT"))
     raise Exception("Unknown pdfmerger: {}".format(name))
@@ -1,4 +1,5 @@
 import os
+from typing import Union
 
 from ..render.backends.svg.utils import svg_begin, svg_end
 from ..utils.sxml import Xml
@@ -25,10 +26,46 @@ class RenderUnit:
 
 
 class SvgRenderUnit(RenderUnit):
-    def __init__(self, slide, step, svg, inkscape):
+    def __init__(self, slide, step, svg, inkscape, fingerprint=None, embed_images=None):
+        """
+        `svg` is either the SVG source (a string or an `Xml` document) or a function that
+        generates it when it is needed.
+
+        If `fingerprint` is set, it is used as the cache key of the exported file instead of
+        the SVG source, so the SVG is not generated when the export is already cached.
+
+        If the SVG source links image files, `embed_images` is a function that embeds the
+        files into it. The linked version is used only for exporting by Inkscape.
+        """
         super().__init__(slide, step)
-        self.svg = svg
+        self._svg = svg
         self.inkscape = inkscape
+        self.fingerprint = fingerprint
+        self.embed_images = embed_images
+        self._standalone_svg = None
+
+    @property
+    def svg(self) -> str:
+        """Standalone SVG source of the page."""
+        if self.embed_images is None:
+            return self.export_svg
+        if self._standalone_svg is None:
+            self._standalone_svg = self.embed_images(self.export_svg)
+        return self._standalone_svg
+
+    @property
+    def export_svg(self) -> str:
+        """SVG source that is passed to Inkscape."""
+        source = self._get_export_source()
+        if isinstance(source, Xml):
+            source = source.to_string()
+            self._svg = source
+        return source
+
+    def _get_export_source(self) -> Union[str, Xml]:
+        if callable(self._svg):
+            self._svg = self._svg()
+        return self._svg
 
     def write_debug(self, out_dir):
         svg_file = os.path.join(
@@ -38,13 +75,22 @@ class SvgRenderUnit(RenderUnit):
             f.write(self.svg)
 
     def export(self, fs_cache, export_type):
-        return fs_cache.ensure(
-            self.svg.encode(),
-            export_type,
-            lambda source, target, et: export_by_inkscape(
-                self.inkscape, source, target, et
-            ),
-        )
+        def get_source():
+            # Exported SVG files have to be standalone
+            if export_type == "svg":
+                return self.svg
+            return self._get_export_source()
+
+        def constructor(_input_data, target, et):
+            export_by_inkscape(self.inkscape, get_source(), target, et)
+
+        if self.fingerprint is not None:
+            return fs_cache.ensure(self.fingerprint, export_type, constructor)
+        source = get_source()
+        if isinstance(source, Xml):
+            # The document is hashed and written for Inkscape without joining it
+            return fs_cache.ensure_by_chunks(source.chunks, export_type, constructor)
+        return fs_cache.ensure(source.encode(), export_type, constructor)
 
     def get_svg(self):
         return self.svg
@@ -76,7 +122,7 @@ def per_page_grouping(backend, units, count_x, count_y, width, height):
         if idx > 0:
             svg_end(xml)
             new_units.append(
-                SvgRenderUnit(None, None, xml.to_string(), backend.inkscape)
+                SvgRenderUnit(None, None, xml.to_string(), backend.inkscape_pool)
             )
 
     assert count_x > 0
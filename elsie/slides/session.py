@@ -0,0 +1,61 @@
+import contextlib
+from typing import TYPE_CHECKING, Callable, Dict, Tuple
+
+from ..utils.cache import FsCache
+
+if TYPE_CHECKING:
+    from ..render.backends import Backend
+
+
+class Session:
+    """
+    Keeps backends and file caches of slide decks alive between executions of a presentation
+    script.
+
+    Slide decks created while a session is active reuse the backend and the file cache of the
+    session (unless a backend is passed explicitly) and they are rendered incrementally.
+    """
+
+    def __init__(self):
+        self.backends: Dict[str, "Backend"] = {}
+        self.fs_caches: Dict[Tuple[str, str], FsCache] = {}
+        # Modules (and their files) imported by the last execution of the script
+        self.script_modules: Dict[str, str] = {}
+
+    def get_backend(self, cache_dir: str, constructor: Callable[[], "Backend"]):
+        backend = self.backends.get(cache_dir)
+        if backend is None:
+            backend = constructor()
+            self.backends[cache_dir] = backend
+        return backend
+
+    def get_fs_cache(self, cache_dir: str, version: str) -> FsCache:
+        key = (cache_dir, version)
+        fs_cache = self.fs_caches.get(key)
+        if fs_cache is None:
+            fs_cache = FsCache(cache_dir, version)
+            self.fs_caches[key] = fs_cache
+        return fs_cache
+
+    def new_run(self):
+        """Called before the presentation script is executed again."""
+        for fs_cache in self.fs_caches.values():
+            fs_cache.touched_files.clear()
+
+
+_active_session = None
+
+
+def get_active_session() -> Session:
+    return _active_session
+
+
+@contextlib.contextmanager
+def activate_session(session: Session):
+    global _active_session
+    previous = _active_session
+    _active_session = session
+    try:
+        yield session
+    finally:
+        _active_session = previous
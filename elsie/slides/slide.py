@@ -4,6 +4,7 @@ from typing import TYPE_CHECKING
 from ..boxtree.box import Box
 from ..boxtree.layout import Layout
 from ..render import jupyter
+from ..render.backends.backend import TextQuery
 from ..render.render import ExportedRenderUnit
 from ..utils.geom import Rect
 from .show import ShowInfo
@@ -43,6 +44,7 @@ class Slide:
         self.max_step = 1
         self.temp_cache = temp_cache
         self.fs_cache = fs_cache
+        self.pending_queries = []
 
     def box(self):
         return self._box
@@ -51,6 +53,24 @@ class Slide:
         """Returns the current maximum fragment."""
         return self.max_step
 
+    def text_query(
+        self, method: str, parsed_text, style, styles, id_index=None
+    ) -> TextQuery:
+        """
+        Registers a text measurement (`method` is "width", "height" or "x").
+
+        Queries are not computed immediately; they are resolved by the backend just before the
+        slide is laid out, so texts of slides that are not rendered are never measured.
+        """
+        query = TextQuery(method, parsed_text, style, styles, id_index)
+        self.pending_queries.append(query)
+        return query
+
+    def take_pending_queries(self):
+        queries = self.pending_queries
+        self.pending_queries = []
+        return queries
+
     def prepare(self):
         rect = Rect(0, 0, self.width, self.height)
         self._box.layout.set_rect(rect)
@@ -60,8 +80,8 @@ class Slide:
         self._box._traverse(lambda box: shows.append(box._min_steps()))
         return max(value for value in shows if value)
 
-    def make_render_unit(self, backend, step, export_type: str):
-        return backend.create_render_unit(self, step, export_type)
+    def make_render_unit(self, backend, step, export_type: str, incremental=False):
+        return backend.create_render_unit(self, step, export_type, incremental)
 
     def _repr_html_(self):
         return jupyter.render_slide_html(self)
@@ -71,12 +91,15 @@ class ExternPdfSlide:
     def __init__(self, filename):
         self.filename = os.path.abspath(filename)
 
+    def take_pending_queries(self):
+        return []
+
     def prepare(self):
         pass
 
     def steps(self):
         return 1
 
-    def make_render_unit(self, backend, step, export_type):
+    def make_render_unit(self, backend, step, export_type, incremental=False):
         assert export_type == "pdf"
         return ExportedRenderUnit(self, step, self.filename, "pdf")
@@ -10,8 +10,9 @@ from ..render.render import per_page_grouping
 from ..text.highlight import make_highlight_styles
 from ..text.stylecontainer import StyleContainer
 from ..text.textstyle import TextStyle
-from ..utils.cache import FsCache
+from ..utils.cache import FsCache, LruCache
 from ..version import VERSION
+from .session import get_active_session
 from .slide import ExternPdfSlide, Slide
 
 if TYPE_CHECKING:
@@ -19,6 +20,11 @@ if TYPE_CHECKING:
     from ..render.backends import Backend
     from ..render.render import RenderUnit
 
+# Maximal total length of serialized SVG images that are kept in memory
+IMAGE_PAYLOADS_CACHE_SIZE = 64 * 1024 * 1024
+# Default size limit of loaded images that are kept in memory
+TEMP_CACHE_SIZE = 256 * 1024 * 1024
+
 
 class SlideDeck(StyleContainer):
     """
@@ -36,6 +42,8 @@ class SlideDeck(StyleContainer):
         backend: "Backend" = None,
         cache_dir=DEFAULT_CACHE_DIR,
         name_policy="auto",
+        temp_cache_size=TEMP_CACHE_SIZE,
+        image_dpi: int = None,
     ):
         """
         Parameters
@@ -63,6 +71,15 @@ class SlideDeck(StyleContainer):
         backend: Backend
             Backend used for computating layout and rendering slides.
             The default backend is InkscapeBackend.
+        temp_cache_size: int
+            Approximate limit (in bytes) of the memory used by loaded images.
+            The least recently used images are released when the limit is exceeded and they
+            are loaded again when they are drawn. Images that are not given by a filename
+            are stored in the cache directory, so they can be loaded again as well.
+        image_dpi: int
+            If set, PNG and JPEG images whose resolution is higher than needed for their
+            drawn size at this DPI are downscaled. Downscaled images are stored in the
+            cache directory.
         """
         if name_policy not in ("auto", "unique", "ignore", "replace"):
             raise Exception("Invalid value for name_policy")
@@ -77,6 +94,7 @@ class SlideDeck(StyleContainer):
         self.height = height
         self.debug = debug
         self.bg_color = bg_color
+        self.image_dpi = image_dpi
         self._slides = []
         styles = {
             "default": TextStyle(
@@ -101,18 +119,29 @@ class SlideDeck(StyleContainer):
         }
         styles.update(make_highlight_styles(pygments_theme))
         StyleContainer.__init__(self, styles)
-        self.temp_cache = {}
+        self.temp_cache = LruCache(temp_cache_size, sizeof=sys.getsizeof)
+        self.image_payloads = LruCache(IMAGE_PAYLOADS_CACHE_SIZE)
 
         cache_dir = os.path.abspath(cache_dir)
         if not os.path.isdir(cache_dir):
             print("Creating cache directory:", cache_dir)
             os.makedirs(cache_dir)
 
+        session = get_active_session()
         if backend is None:
-            backend = InkscapeBackend(cache_dir=cache_dir)
+            if session is not None:
+                backend = session.get_backend(
+                    cache_dir, lambda: InkscapeBackend(cache_dir=cache_dir)
+                )
+            else:
+                backend = InkscapeBackend(cache_dir=cache_dir)
         self.backend = backend
         self.backend.set_dimensions(width, height)
-        self.fs_cache = FsCache(cache_dir, self.backend.get_version(VERSION))
+        version = self.backend.get_version(VERSION)
+        if session is not None:
+            self.fs_cache = session.get_fs_cache(cache_dir, version)
+        else:
+            self.fs_cache = FsCache(cache_dir, version)
 
     def get_slide_by_name(self, name: str) -> Union[Slide, None]:
         """Returns a slide with the given name."""
@@ -271,6 +300,7 @@ class SlideDeck(StyleContainer):
         save_cache=True,
         select_slides: List[Slide] = None,
         slides_per_page: Tuple[int, int] = None,
+        incremental=False,
     ) -> "Union[None, List[RenderUnit], List[str]]":
         """
         Renders the presentation into a PDF file.
@@ -290,8 +320,11 @@ class SlideDeck(StyleContainer):
             For other formats, `output` is ignored and returns a list of filenames
             with exported files. The files are placed into cache directory and could be
             removed by another call of render with `prune_cache=True`.
-        pdf_merger: {"pypdf", "pdfunite"}
+        pdf_merger: {"pypdf", "pypdf-stream", "pdfunite"}
             Method used to merge PDFs together. It is used when export_type is "pdf".
+            "pypdf-stream" writes pages into the output one by one instead of keeping all
+            of them in memory and it stores shared resources (e.g. fonts and images) only
+            once.
         slide_postprocessing: Callable[[List[Box]], ...]
             This function will be called just before the slides are rendered.
             It will be passed a list of root boxes, one for each slide.
@@ -302,6 +335,10 @@ class SlideDeck(StyleContainer):
             Must be a 2-element tuple (R, C) of integers.
             Renders a grid of (R, C) slides per each page.
             If not defined, then each slide is rendered on a single page.
+        incremental: bool
+            If True, pages whose content has not changed since the last render are not
+            rendered again and the output file is not rewritten if no page has changed.
+            Slide decks created in the watch mode are always rendered incrementally.
 
         Other Parameters
         ----------------
@@ -310,6 +347,7 @@ class SlideDeck(StyleContainer):
             If True, then after a successful render, all data that was not used for this render
             will be removed from the cache directory.
             Otherwise unused data will not be touched.
+            Measured texts are pruned only when all slides are rendered.
 
         save_cache: bool
             If True, the query cache will be updated when all queries are computed.
@@ -317,6 +355,9 @@ class SlideDeck(StyleContainer):
         if select_slides is None:
             select_slides = self._slides
 
+        if get_active_session() is not None:
+            incremental = True
+
         if not select_slides:
             raise Exception("No slides to render")
 
@@ -333,17 +374,21 @@ class SlideDeck(StyleContainer):
         if slide_postprocessing:
             slide_postprocessing([slide.box() for slide in select_slides])
 
-        if prune_cache:
-            self.backend.prune_cache()
-
-        if save_cache:
-            self.backend.save_cache()
+        self._resolve_queries(select_slides, prune_cache, save_cache)
 
         units = []
-        for slide in select_slides:
-            slide.prepare()
-            for step in range(1, slide.steps() + 1):
-                units.append(slide.make_render_unit(self.backend, step, export_type))
+        try:
+            for slide in select_slides:
+                slide.prepare()
+                for step in range(1, slide.steps() + 1):
+                    units.append(
+                        slide.make_render_unit(
+                            self.backend, step, export_type, incremental
+                        )
+                    )
+        finally:
+            # The memo keeps the fingerprinted values alive
+            self.backend.fingerprint_memo.clear()
 
         if self.debug:
             for unit in units:
@@ -365,22 +410,50 @@ class SlideDeck(StyleContainer):
         if export_type == "pdf" and pdf_merger is not None:
             merger = get_pdf_merger_by_name(pdf_merger)
         else:
-            merger = []
+            merger = None
+
+        outputs = self._export_units(units, export_type)
+        if merger is not None:
+            self._write_output(output, outputs, merger, incremental)
+        if prune_cache:
+            self.fs_cache.remove_unused()
+        if merger is None:
+            return outputs
+
+    def _resolve_queries(self, select_slides: List[Slide], prune_cache, save_cache):
+        # Text measurements are registered when boxes are created; compute all of them
+        # for the selected slides in one batch
+        queries = []
+        for slide in select_slides:
+            queries += slide.take_pending_queries()
+        self.backend.resolve_queries(queries)
+
+        # Texts of other slides are not measured, so their cached values would be pruned
+        if prune_cache and set(select_slides).issuperset(self._slides):
+            self.backend.prune_cache()
+
+        if save_cache:
+            self.backend.save_cache()
 
+    def _export_units(self, units, export_type: str) -> List[str]:
         self._show_progress("Building", first=True)
-        for i, unit in enumerate(units):
-            unit_output = unit.export(self.fs_cache, export_type)
-            if unit_output is not None:
-                merger.append(unit_output)
-            self._show_progress("Building", i, len(units))
+        outputs = self.backend.export_units(
+            units,
+            self.fs_cache,
+            export_type,
+            lambda count: self._show_progress("Building", count, len(units)),
+        )
+        outputs = [unit_output for unit_output in outputs if unit_output is not None]
         self._show_progress("Building", len(units), len(units), last=True)
+        return outputs
 
-        if export_type == "pdf" and pdf_merger is not None:
-            merger.write(output, self.debug)
-            if prune_cache:
-                self.fs_cache.remove_unused()
-            print("SlideDeck written into '{}'".format(output))
-        else:
-            if prune_cache:
-                self.fs_cache.remove_unused()
-            return merger
+    def _write_output(self, output: str, outputs: List[str], merger, incremental):
+        if incremental and self.fs_cache.is_output_up_to_date(output, outputs):
+            print("SlideDeck '{}' is up to date".format(output))
+            return
+        for unit_output in outputs:
+            merger.append(unit_output)
+        merger.write(output, self.debug)
+        if incremental:
+            self.fs_cache.store_output(output, outputs)
+        print("SlideDeck written into '{}'".format(output))
@@ -2,11 +2,11 @@ from typing import TYPE_CHECKING
 
 from ..boxtree.boxitem import BoxItem
 from ..boxtree.lazy import LazyValue
-from ..render.backends.backend import Backend
 from .textparser import extract_line, number_of_lines
 
 if TYPE_CHECKING:
     from ..boxtree import box
+    from ..slides import slide
 
 
 def text_x_in_rect(rect, style):
@@ -31,7 +31,7 @@ class TextBoxItem(BoxItem):
         self._style = style
         self._styles = styles
         self._parsed_text = parsed_text
-        self._make_query(box.slide.slides.backend)
+        self._make_query(box.slide)
 
         if scale_to_fit:
 
@@ -63,8 +63,11 @@ class TextBoxItem(BoxItem):
                 rotation=self.rotation,
             )
 
-    def _make_query(self, backend: Backend):
-        width = backend.compute_text_width(self._parsed_text, self._style, self._styles)
+    def _make_query(self, slide: "slide.Slide"):
+        query = slide.text_query("width", self._parsed_text, self._style, self._styles)
+        query.add_callback(self._set_text_width)
+
+    def _set_text_width(self, width: float):
         layout = self._box.layout
         style = self._style
         line_height = style.size * style.line_spacing
@@ -151,23 +154,25 @@ class TextBoxItem(BoxItem):
 
         line, index_in_line = extract_line(self._parsed_text, index)
 
-        backend = self._box.slide.slides.backend
-        query_x = backend.compute_text_x(
-            line, self._style, self._styles, id_index=index_in_line
+        slide = self._box.slide
+        query_x = slide.text_query(
+            "x", line, self._style, self._styles, id_index=index_in_line
         )
-        query_w = backend.compute_text_width(
-            line, self._style, self._styles, id_index=index_in_line
+        query_w = slide.text_query(
+            "width", line, self._style, self._styles, id_index=index_in_line
         )
 
         box_args.setdefault(
             "x",
             LazyValue(
                 lambda: text_x_in_rect(self._box.layout.rect, self._style)
-                + query_x * self._text_scale
+                + query_x.value * self._text_scale
             ),
         )
         box_args.setdefault("y", LazyValue(compute_y))
-        box_args.setdefault("width", LazyValue(lambda: query_w * self._text_scale))
+        box_args.setdefault(
+            "width", LazyValue(lambda: query_w.value * self._text_scale)
+        )
         box_args.setdefault("height", LazyValue(compute_height))
 
         return self._box.box(**box_args)
@@ -1,7 +1,10 @@
 import hashlib
+import json
 import os
 import tempfile
 import threading
+from collections import OrderedDict
+from typing import List
 
 
 class FsCache:
@@ -38,6 +41,28 @@ class FsCache:
 
     def ensure(self, input_data, data_type, constructor, wait_on_collision=True):
         cache_file = self._get_filename(input_data, data_type)
+        return self._ensure(
+            cache_file, input_data, data_type, constructor, wait_on_collision
+        )
+
+    def ensure_by_chunks(
+        self, chunks: List[str], data_type, constructor, wait_on_collision=True
+    ):
+        """
+        Same as `ensure`, but the input is a list of strings that is hashed without
+        joining it. The constructor gets the list as its input.
+        """
+        h = self.hasher.copy()
+        for chunk in chunks:
+            h.update(chunk.encode())
+        cache_file = "cache.{}.{}".format(h.hexdigest(), data_type)
+        return self._ensure(
+            cache_file, chunks, data_type, constructor, wait_on_collision
+        )
+
+    def _ensure(
+        self, cache_file, input_data, data_type, constructor, wait_on_collision
+    ):
         full_path = self._full_path(cache_file)
         with self.lock:
             self.touched_files.add(cache_file)
@@ -45,14 +70,21 @@ class FsCache:
             if condition is not None:
                 if wait_on_collision:
                     condition.wait()
-                    assert cache_file in self.cache_files
+                    if cache_file not in self.cache_files:
+                        raise Exception(f"Construction of '{cache_file}' failed")
                 return full_path
             if cache_file in self.cache_files:
                 return full_path
+            condition = threading.Condition(self.lock)
+            self.in_progress[cache_file] = condition
 
-        condition = threading.Condition(self.lock)
-        self.in_progress[cache_file] = condition
-        constructor(input_data, full_path, data_type)
+        try:
+            constructor(input_data, full_path, data_type)
+        except BaseException:
+            with self.lock:
+                del self.in_progress[cache_file]
+                condition.notify_all()
+            raise
         with self.lock:
             self.cache_files.add(cache_file)
             del self.in_progress[cache_file]
@@ -62,6 +94,7 @@ class FsCache:
     def remove_unused(self):
         for filename in self.cache_files.difference(self.touched_files):
             os.remove(self._full_path(filename))
+            self.cache_files.remove(filename)
 
     def get(self, input_data, data_type, constructor):
         cache_file = self._get_filename(input_data, data_type)
@@ -78,6 +111,118 @@ class FsCache:
         self.cache_files.add(cache_file)
         return result
 
+    def _outputs_file(self):
+        return self._full_path("outputs.cache")
+
+    def _load_outputs(self):
+        path = self._outputs_file()
+        if not os.path.isfile(path):
+            return {}
+        with open(path) as f:
+            return json.load(f)
+
+    def is_output_up_to_date(self, output: str, inputs) -> bool:
+        """
+        Checks that `output` was created by `store_output` from the same input files and
+        that none of the files was modified since then.
+        """
+        if not os.path.isfile(output):
+            return False
+        state = self._load_outputs().get(os.path.abspath(output))
+        return state == [_files_state(inputs), _files_state([output])]
+
+    def store_output(self, output: str, inputs):
+        """Remembers the state of `output` that was created from the given input files."""
+        outputs = self._load_outputs()
+        outputs[os.path.abspath(output)] = [
+            _files_state(inputs),
+            _files_state([output]),
+        ]
+        with open(self._outputs_file(), "w") as f:
+            json.dump(outputs, f)
+
+
+class LruCache:
+    """
+    In-memory cache that evicts the least recently used entries when the total size of
+    stored values exceeds `max_size`.
+
+    The size of a value is computed by `sizeof` unless it is passed explicitly to `set`.
+    """
+
+    def __init__(self, max_size: int, sizeof=len):
+        self.max_size = max_size
+        self.sizeof = sizeof
+        self.entries = OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    def __getitem__(self, key):
+        entry = self._get_entry(key)
+        if entry is None:
+            raise KeyError(key)
+        return entry[0]
+
+    def __setitem__(self, key, value):
+        self.set(key, value)
+
+    def get(self, key, default=None):
+        entry = self._get_entry(key)
+        if entry is None:
+            return default
+        return entry[0]
+
+    def _get_entry(self, key):
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.entries.move_to_end(key)
+        return entry
+
+    def set(self, key, value, size: int = None):
+        if size is None:
+            size = self.sizeof(value)
+        old = self.entries.pop(key, None)
+        if old is not None:
+            self.size -= old[1]
+        self.entries[key] = (value, size)
+        self.size += size
+        # The newest entry is always kept, even if it is larger than the limit
+        while self.size > self.max_size and len(self.entries) > 1:
+            _, (_, old_size) = self.entries.popitem(last=False)
+            self.size -= old_size
+
+    def clear(self):
+        """Removes all entries; statistics are kept."""
+        self.entries.clear()
+        self.size = 0
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self.entries),
+            "size": self.size,
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+def _files_state(filenames) -> str:
+    h = hashlib.sha1()
+    for filename in filenames:
+        stat = os.stat(filename)
+        h.update(f"{filename}:{stat.st_mtime_ns}:{stat.st_size}\n".encode())
+    return h.hexdigest()
+
 
 def get_cache_file_path(directory: str, extension: str) -> str:
     temp_path = os.path.abspath(
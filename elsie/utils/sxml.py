@@ -1,3 +1,7 @@
+# Chunks of at least this length are not copied when a document is compacted
+LARGE_CHUNK_SIZE = 64 * 1024
+
+
 class Xml:
     def __init__(self):
         self.chunks = []
@@ -15,21 +19,28 @@ class Xml:
 
     def element(self, name):
         self._close()
-        self.chunks.append("<")
-        self.chunks.append(name)
+        self.chunks.append("<" + name)
         self.stack.append(name)
         self.is_open = True
 
     def set(self, name, value, escape=True):
         assert self.is_open
+        value_type = type(value)
+        # Numbers do not contain any characters that have to be escaped
+        if value_type is float or value_type is int:
+            self.chunks.append(f" {name}='{value}'")
+            return
         if escape:
-            value = str(value).replace("'", "\\'")
-        self.chunks.append(" {}='{}'".format(name, escape_text(value)))
+            value = escape_attribute(str(value))
+        else:
+            value = escape_text(value)
+        self.chunks.append(f" {name}='{value}'")
 
     def text(self, text):
         self._close()
         text = escape_text(str(text))
-        text = text.replace(" ", "&#160;")
+        if " " in text:
+            text = text.replace(" ", "&#160;")
         self.chunks.append(text)
 
     def close(self, text=None):
@@ -43,23 +54,56 @@ class Xml:
             self.stack.pop()
             self.chunks.append(" />")
         else:
-            self.chunks.append("</")
-            self.chunks.append(self.stack.pop())
-            self.chunks.append(">")
+            self.chunks.append(f"</{self.stack.pop()}>")
 
     def to_string(self):
         assert len(self.stack) == 0, "Empty stack"
         return "".join(self.chunks)
 
+    def compact(self):
+        """
+        Joins adjacent small chunks to save memory.
+
+        Large chunks (e.g. embedded images) are kept as they are, so they are not copied
+        into a new string.
+        """
+        chunks = []
+        small_chunks = []
+        for chunk in self.chunks:
+            if len(chunk) >= LARGE_CHUNK_SIZE:
+                if small_chunks:
+                    chunks.append("".join(small_chunks))
+                    small_chunks = []
+                chunks.append(chunk)
+            else:
+                small_chunks.append(chunk)
+        if small_chunks:
+            chunks.append("".join(small_chunks))
+        self.chunks = chunks
+
     def write(self, filename):
-        assert len(self.stack) == 0, "Empty stack"
         with open(filename, "w") as f:
-            for chunk in self.chunks:
-                f.write(chunk)
+            self.write_to(f)
+
+    def write_to(self, stream):
+        """Writes the document into a text stream without joining it into a string."""
+        assert len(self.stack) == 0, "Empty stack"
+        stream.writelines(self.chunks)
 
 
 def escape_text(text):
-    text = text.replace("&", "&amp;")
-    text = text.replace("<", "&lt;")
-    text = text.replace(">", "&gt;")
+    if "&" in text:
+        text = text.replace("&", "&amp;")
+    if "<" in text:
+        text = text.replace("<", "&lt;")
+    if ">" in text:
+        text = text.replace(">", "&gt;")
+    return text
+
+
+def escape_attribute(text):
+    """Escapes a text, so that it can be used as an attribute value in single quotes."""
+    text = escape_text(text)
+    if "'" in text:
+        text = text.replace("'", "&apos;")
     return text
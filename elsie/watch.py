@@ -0,0 +1,100 @@
+import os
+import runpy
+import site
+import sys
+import time
+import traceback
+from typing import Dict, List
+
+from .slides.session import Session, activate_session
+
+
+def _installed_dirs() -> List[str]:
+    dirs = [sys.prefix, sys.base_prefix, site.getusersitepackages()]
+    if hasattr(site, "getsitepackages"):
+        dirs += site.getsitepackages()
+    return [os.path.abspath(path) + os.sep for path in dirs]
+
+
+def _script_modules(directory: str, loaded_modules) -> Dict[str, str]:
+    """
+    Returns modules (and their files) that were imported from the given directory and that
+    are not among `loaded_modules`.
+    """
+    installed_dirs = _installed_dirs()
+    modules = {}
+    for name, module in list(sys.modules.items()):
+        if name in loaded_modules or name == "elsie" or name.startswith("elsie."):
+            continue
+        filename = getattr(module, "__file__", None)
+        if not filename:
+            continue
+        filename = os.path.abspath(filename)
+        if filename.startswith(directory + os.sep) and not any(
+            filename.startswith(path) for path in installed_dirs
+        ):
+            modules[name] = filename
+    return modules
+
+
+def _files_mtimes(filenames) -> Dict[str, float]:
+    mtimes = {}
+    for filename in filenames:
+        try:
+            mtimes[filename] = os.stat(filename).st_mtime
+        except OSError:
+            mtimes[filename] = None
+    return mtimes
+
+
+def run_script(script: str, session: Session) -> Dict[str, float]:
+    """
+    Executes the presentation script within the given session.
+
+    Returns modification times of the script and of all modules imported from its directory.
+    """
+    script = os.path.abspath(script)
+    directory = os.path.dirname(script)
+
+    # Modules imported by the script from its directory are imported again, so that their
+    # changes are applied
+    for name in session.script_modules:
+        sys.modules.pop(name, None)
+    loaded_modules = set(sys.modules)
+
+    session.new_run()
+    argv = sys.argv
+    sys.argv = [script]
+    sys.path.insert(0, directory)
+    try:
+        with activate_session(session):
+            runpy.run_path(script, run_name="__main__")
+    except SystemExit:
+        pass
+    except Exception:
+        traceback.print_exc()
+    finally:
+        sys.argv = argv
+        sys.path.remove(directory)
+
+    session.script_modules = _script_modules(directory, loaded_modules)
+    files = [script] + list(session.script_modules.values())
+    return _files_mtimes(files)
+
+
+def watch(script: str, interval=0.5):
+    """
+    Renders the presentation script and renders it again whenever the script (or a module
+    imported from its directory) changes.
+
+    Backends and caches are kept in memory between the renders.
+    """
+    session = Session()
+    try:
+        while True:
+            mtimes = run_script(script, session)
+            print("Watching for changes of '{}' ...".format(script))
+            while _files_mtimes(mtimes) == mtimes:
+                time.sleep(interval)
+    except KeyboardInterrupt:
+        pass
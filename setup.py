@@ -38,6 +38,7 @@ Check out its documentation at https://spirali.github.io/elsie.
     packages=find_packages(),
     install_requires=dependencies,
     extras_require=extras,
+    entry_points={"console_scripts": ["elsie=elsie.__main__:main"]},
     classifiers=(
         "Programming Language :: Python :: 3",
         "License :: OSI Approved :: MIT License",
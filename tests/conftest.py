@@ -18,8 +18,10 @@ from elsie.render.inkscape import InkscapeShell  # noqa
 
 
 class SlideTester:
-    def __init__(self, backend):
-        self.slides = elsie.SlideDeck(name_policy="ignore", backend=backend)
+    def __init__(self, backend, **deck_args):
+        self.slides = elsie.SlideDeck(
+            name_policy="ignore", backend=backend, **deck_args
+        )
         self._slide = None
 
     @property
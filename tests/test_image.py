@@ -1,8 +1,16 @@
+import base64
+import glob
 import io
+import os
 
-from conftest import check
+import lxml.etree as et
+from conftest import SlideTester, check
+from PIL import Image
 
 import elsie
+from elsie.render.backends.svg.backend import InkscapeBackend
+from elsie.render.image import ImageFragments, create_image_data, get_image_steps
+from elsie.utils.cache import LruCache
 
 
 @check("imagefrag", expect_count=6, cairo_threshold=15)
@@ -170,3 +178,166 @@ def test_image_other_sources(test_env):
     slide = test_env.slide
     slide.box(width=100, height=100).image(data, image_type="png")
     slide.box(width=100, height=100).image(io.BytesIO(data), image_type="png")
+
+
+def test_image_fragments_memoization(test_env):
+    root = et.parse(test_env.assets_path("testimage.svg")).getroot()
+    payloads = LruCache(10_000_000)
+    fragments = ImageFragments(root, payloads, "testimage")
+    steps = get_image_steps(root)
+
+    for step in range(1, steps + 3):
+        assert fragments.get(step) == create_image_data(root, step)
+    # Steps after the last fragment show the same elements
+    assert len(payloads) == steps
+    assert fragments.get(steps + 1) is fragments.get(steps + 2)
+
+    assert fragments.get_full() is fragments.get_full()
+    assert len(payloads) == steps + 1
+
+    # Only the most recent payload is kept if it exceeds the size limit
+    payloads = LruCache(1)
+    fragments = ImageFragments(root, payloads, "testimage")
+    fragments.get(1)
+    assert fragments.get(2) == create_image_data(root, 2)
+    assert len(payloads) == 1
+    assert fragments.get(1) == create_image_data(root, 1)
+
+
+def test_image_defined_once_per_page(test_env, inkscape_shell):
+    slides = SlideTester(
+        InkscapeBackend(inkscape=inkscape_shell, reuse_images=True)
+    ).slides
+    slide = slides.new_slide()
+    for _ in range(2):
+        slide.box(width=100, height=100).image(test_env.assets_path("test.png"))
+        slide.box(width=100).image(test_env.assets_path("testimage.svg"))
+
+    units = slides.render(None, return_units=True)
+    svg = units[0].svg
+    assert svg.count("base64,") == 1
+    assert svg.count("<defs>") == 2
+    assert svg.count("<use ") == 4
+
+
+def test_image_bitmap_prepared_once(test_env):
+    path = test_env.assets_path("test.png")
+    for _ in range(2):
+        test_env.slides.new_slide().image(path)
+
+    data = test_env.slides.temp_cache[(path, "bitmap")][3]
+    assert isinstance(data, str)
+    for unit in test_env.slides.render(None, return_units=True):
+        assert "base64,{}'".format(data) in unit.svg
+
+
+def test_image_temp_cache_limit(test_env):
+    png = test_env.assets_path("test.png")
+    jpeg = test_env.assets_path("test.jpeg")
+    slides = SlideTester(test_env.slides.backend, temp_cache_size=1).slides
+    slides.new_slide().image(png)
+    slides.new_slide().image(jpeg)
+    assert len(slides.temp_cache) == 1
+    assert (jpeg, "bitmap") in slides.temp_cache
+
+    slides.new_slide().image(jpeg)
+    slides.new_slide().image(png)
+    stats = slides.temp_cache.stats()
+    assert (stats["hits"], stats["misses"]) == (1, 3)
+    assert stats["size"] == len(slides.temp_cache[(png, "bitmap")][3])
+
+    # Painters look the images up when they are drawn, so evicted images are loaded again
+    units = slides.render(None, return_units=True)
+    assert all("base64," in unit.svg for unit in units)
+    assert len(slides.temp_cache) == 1
+
+    slides.temp_cache.clear()
+    assert len(slides.temp_cache) == 0
+    assert slides.temp_cache.stats()["size"] == 0
+
+
+def test_image_data_source_evicted(test_env):
+    with open(test_env.assets_path("test.png"), "rb") as f:
+        data = f.read()
+    slide = test_env.slide
+    slide.box(width=100, height=100).image(data, image_type="png")
+    slide.box(width=100, height=100).image(io.BytesIO(data), image_type="png")
+
+    # Both sources are stored in a single file of the cache directory
+    assert len(glob.glob("elsie-cache/cache.*.bitmap")) == 1
+    test_env.slides.temp_cache.clear()
+    svg = test_env.slides.render(None, return_units=True)[0].svg
+    assert svg.count("base64,") == 2
+
+
+def test_image_bitmap_downscale(test_env):
+    Image.new("RGB", (2000, 1000), (255, 0, 0)).save("big.png")
+
+    def render():
+        slides = SlideTester(test_env.slides.backend, image_dpi=96).slides
+        slides.new_slide().box(width=200).image("big.png")
+        slides.new_slide().box(width=4000).image("big.png")
+        return [unit.svg for unit in slides.render(None, return_units=True)]
+
+    svgs = render()
+    files = glob.glob("elsie-cache/cache.*.png")
+    assert len(files) == 1
+    with Image.open(files[0]) as image:
+        assert image.size == (200, 100)
+    with open(files[0], "rb") as f:
+        encoded = base64.b64encode(f.read()).decode()
+    assert encoded in svgs[0]
+    # Images are never upscaled
+    assert encoded not in svgs[1]
+
+    mtime = os.stat(files[0]).st_mtime_ns
+    assert render() == svgs
+    assert os.stat(files[0]).st_mtime_ns == mtime
+
+
+def test_image_bitmap_links(test_env, inkscape_shell):
+    def render(backend):
+        slides = SlideTester(backend).slides
+        slide = slides.new_slide()
+        slide.box(width=100).image(test_env.assets_path("test.png"))
+        slide.box(width=100).image(test_env.assets_path("test.jpeg"))
+        return slides.render(None, return_units=True)[0]
+
+    unit = render(InkscapeBackend(inkscape=inkscape_shell, link_images=True))
+    assert "base64," not in unit.export_svg
+    files = glob.glob(os.path.abspath("elsie-cache/cache.*"))
+    assert len(files) == 2
+    for filename in files:
+        assert "xlink:href='{}'".format(filename) in unit.export_svg
+
+    assert unit.svg == render(InkscapeBackend(inkscape=inkscape_shell)).svg
+    unit.export(test_env.slides.fs_cache, "pdf")
+
+
+def test_image_bitmap_links_escaped(test_env, inkscape_shell):
+    Image.new("RGB", (2000, 1000), (255, 0, 0)).save("big.png")
+    backend = InkscapeBackend(inkscape=inkscape_shell, link_images=True)
+    slides = SlideTester(backend, cache_dir="cache & 'x'", image_dpi=96).slides
+    slides.new_slide().box(width=200).image("big.png")
+    unit = slides.render(None, return_units=True)[0]
+
+    # The downscaled image is linked from the cache, it is not copied again
+    files = glob.glob("cache & 'x'/cache.*.png")
+    assert len(files) == 1
+    root = et.fromstring(unit.export_svg.encode())
+    links = [e.get("{http://www.w3.org/1999/xlink}href") for e in root.iter()]
+    assert os.path.abspath(files[0]) in links
+    with open(files[0], "rb") as f:
+        assert base64.b64encode(f.read()).decode() in unit.svg
+
+
+def test_cairo_bitmap_surface_cache(test_env):
+    from elsie.render.backends.cairo.rcontext import get_bitmap_surface
+
+    with open(test_env.assets_path("test.png"), "rb") as f:
+        data = f.read()
+    surface = get_bitmap_surface(data)
+    # Equal data from another source shares the decoded surface
+    assert get_bitmap_surface(bytes(bytearray(data))) is surface
+    with Image.open(io.BytesIO(data)) as image:
+        assert (surface.get_width(), surface.get_height()) == image.size
@@ -1,6 +1,7 @@
 from conftest import check
 
 from elsie import Arrow, TextStyle
+from elsie.boxtree.layout import Layout
 
 
 @check("header")
@@ -214,3 +215,18 @@ def test_sbox_on_text(test_env):
 
     t = slide.text("Text")
     t.sbox().text("Sbox")
+
+
+def test_layout_size_request_cache():
+    root = Layout(0, 0, None, None)
+    child = root.add()
+    leaf = child.add(width=10, height=20)
+    assert root.compute_size_request()[0].min_size == 10
+    assert root.compute_size_request() is root.compute_size_request()
+
+    leaf.ensure_width(50)
+    assert root.compute_size_request()[0].min_size == 50
+
+    child.add(height=30)
+    assert root.compute_size_request()[1].min_size == 50
+    assert child.managed_children()[1].compute_size_request()[1].min_size == 30
@@ -4,6 +4,8 @@ import os
 from conftest import check
 
 from elsie import SlideDeck
+from elsie.slides.session import Session
+from elsie.watch import run_script
 
 
 # test_env has to be there to switch to work directory
@@ -22,7 +24,7 @@ def test_cache1(test_env):
     print(glob.glob("{}/*".format(cache_dir)))
 
     fs = set(os.path.basename(p) for p in glob.glob("{}/*".format(cache_dir)))
-    assert "queries3.cache" in fs
+    assert "queries4.cache" in fs
     assert len(fs) == 4
 
     slides = SlideDeck(name_policy="ignore")
@@ -48,7 +50,7 @@ def test_cache1(test_env):
 
     print(fs2)
     fs3 = set(os.path.basename(p) for p in glob.glob("{}/*".format(cache_dir)))
-    assert "queries3.cache" in fs3
+    assert "queries4.cache" in fs3
     assert len(fs3.difference(fs)) == 1
 
 
@@ -89,3 +91,34 @@ def test_add_raw_pdf(test_env):
     slides = test_env.slides
     slides.add_pdf(test_env.assets_path("test.pdf"))
     slides.render("test.pdf")
+
+
+# test_env has to be there to switch to work directory
+def test_watch_run_script(test_env):
+    with open("deck.py", "w") as f:
+        f.write(
+            """
+import elsie
+import deckhelper
+slides = elsie.SlideDeck(name_policy="ignore")
+slides.new_slide().text(deckhelper.TEXT)
+slides.render("test.pdf")
+"""
+        )
+    with open("deckhelper.py", "w") as f:
+        f.write("TEXT = 'Hello'\n")
+
+    session = Session()
+    mtimes = run_script("deck.py", session)
+    assert list(mtimes) == [
+        os.path.abspath("deck.py"),
+        os.path.abspath("deckhelper.py"),
+    ]
+    assert list(session.script_modules) == ["deckhelper"]
+    assert os.path.isfile("test.pdf")
+    assert len(session.backends) == 1
+    backend = list(session.backends.values())[0]
+
+    assert run_script("deck.py", session) == mtimes
+    assert list(session.backends.values()) == [backend]
+    assert len(session.fs_caches) == 1
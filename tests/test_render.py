@@ -1,6 +1,16 @@
-from conftest import check
+import glob
+import os
+
+from conftest import SlideTester, check
+from PIL import Image
+from PyPDF2 import PdfFileReader
 
 from elsie import TextStyle
+from elsie.render.backends import CairoBackend
+from elsie.render.backends.recording import RecordingContext
+from elsie.render.backends.svg.backend import InkscapeBackend
+from elsie.render.inkscape import InkscapePool, InkscapeShell
+from elsie.render.pdfmerge import get_pdf_merger_by_name
 
 
 def test_postprocessing(test_env):
@@ -75,3 +85,167 @@ def test_per_page_groupping2(test_env):
         slide = test_env.slides.new_slide()
         slide.rect(bg_color=colors[i % len(colors)])
         slide.text(f"SLIDE {i}", TextStyle(color="white"))
+
+
+def test_fingerprint_memo(test_env):
+    data = "x" * 10000
+    memo = {}
+    fingerprints = []
+    for step in (1, 2):
+        recording = RecordingContext(step, False)
+        recording.draw_bitmap(0, 0, 10, 10, "image/png", data)
+        fingerprints.append(recording.fingerprint(memo=memo))
+    # The digest of the shared value is kept for the other pages
+    assert memo[id(data)][0] is data
+    assert fingerprints[0] == fingerprints[1] == recording.fingerprint()
+
+    for _ in range(2):
+        test_env.slides.new_slide().image(test_env.assets_path("test.png"))
+    test_env.slides.render(None, return_units=True, incremental=True)
+    assert test_env.slides.backend.fingerprint_memo == {}
+
+
+def test_parallel_export(test_env, inkscape_shell):
+    backend = InkscapeBackend(inkscape=inkscape_shell, workers=3)
+    slides = SlideTester(backend).slides
+    deck_slides = [slides.new_slide() for _ in range(6)]
+    for i, slide in enumerate(deck_slides):
+        slide.text(f"Slide {i}")
+
+    pool = backend.inkscape_pool
+    try:
+        outputs = slides.render(output=None, export_type="png")
+        assert len(outputs) == 6
+        assert len(set(outputs)) == 6
+        assert all(os.path.isfile(output) for output in outputs)
+
+        # Shells are kept running between renders
+        shells = list(pool.shells)
+        assert 1 < len(shells) <= 3
+        for i, slide in enumerate(deck_slides):
+            slide.box().text(f"Changed {i}")
+        slides.render(output=None, export_type="png")
+        assert pool.shells == shells
+    finally:
+        pool.close()
+    assert pool.shells == [inkscape_shell]
+    assert pool.free_shells.qsize() == 1
+    with pool.acquire() as shell:
+        assert shell is pool.shells[0]
+
+
+def test_inkscape_shell_input_dir(test_env, inkscape_shell, tmp_path):
+    shell = InkscapeShell(inkscape_shell.inkscape_bin, temp_dir=str(tmp_path))
+    pool = InkscapePool(shell)
+    try:
+        assert os.path.dirname(shell.input_dir) == str(tmp_path)
+        svg = "<svg xmlns='http://www.w3.org/2000/svg'><rect id='a'/></svg>"
+        for i in range(3):
+            pool.convert_to_pdf(svg, f"out{i}.pdf", "pdf")
+            assert os.path.isfile(f"out{i}.pdf")
+        # The input file is reused for all documents
+        assert os.listdir(shell.input_dir) == ["input.svg"]
+    finally:
+        shell.close()
+    assert not os.path.exists(shell.input_dir)
+
+
+def test_cairo_parallel_render(test_env):
+    def render(workers):
+        slides = SlideTester(CairoBackend(workers=workers)).slides
+        for i in range(4):
+            slide = slides.new_slide()
+            slide.box().text(f"Slide {i}")
+            slide.box(width=100, height=20 * (i + 1)).rect(bg_color="red")
+        outputs = slides.render(output=None, export_type="png")
+        return [Image.open(output).tobytes() for output in outputs]
+
+    assert render(3) == render(1)
+
+
+def test_cairo_render_cache(test_env):
+    def render(texts):
+        slides = SlideTester(CairoBackend()).slides
+        for text in texts:
+            slides.new_slide().text(text)
+        return slides.render(output=None, export_type="png")
+
+    outputs = render(["A", "B"])
+    mtimes = [os.stat(output).st_mtime_ns for output in outputs]
+
+    outputs2 = render(["A", "C"])
+    assert outputs2[0] == outputs[0]
+    assert os.stat(outputs2[0]).st_mtime_ns == mtimes[0]
+    assert outputs2[1] != outputs[1]
+    # The page that is no longer used is pruned
+    assert not os.path.exists(outputs[1])
+
+
+def test_streaming_pdf_merger(test_env):
+    image = Image.new("RGB", (200, 100), (255, 0, 0))
+    image.save("a.pdf")
+    image.save("b.pdf")
+    Image.new("RGB", (50, 50), (0, 0, 255)).save("c.pdf")
+
+    merger = get_pdf_merger_by_name("pypdf-stream")
+    for filename in ("a.pdf", "b.pdf", "c.pdf", "a.pdf"):
+        merger.append(filename)
+    merger.write("output.pdf", False)
+
+    with open("output.pdf", "rb") as f:
+        reader = PdfFileReader(f)
+        assert reader.getNumPages() == 4
+        images = [
+            reader.getPage(i)["/Resources"].raw_get("/XObject").getObject()
+            for i in range(4)
+        ]
+        images = [xobjects.raw_get("/image").idnum for xobjects in images]
+        assert images[0] == images[1] == images[3]
+        assert images[0] != images[2]
+        assert reader.getPage(2).mediaBox.getWidth() == 50
+
+    slides = test_env.slides
+    for i in range(3):
+        slides.new_slide().text(f"Slide {i}")
+    slides.render("test.pdf", pdf_merger="pypdf-stream")
+    with open("test.pdf", "rb") as f:
+        assert PdfFileReader(f).getNumPages() == 3
+
+
+def test_incremental_render(test_env):
+    def render(text):
+        slides = SlideTester(test_env.slides.backend).slides
+        for i in range(3):
+            slides.new_slide().text(f"Slide {i}")
+        slides.new_slide().text(text)
+        slides.render("test.pdf", incremental=True)
+        return set(glob.glob("elsie-cache/cache.*"))
+
+    files = render("A")
+    assert len(files) == 4
+    mtime = os.stat("test.pdf").st_mtime_ns
+
+    assert render("A") == files
+    assert os.stat("test.pdf").st_mtime_ns == mtime
+
+    files2 = render("B")
+    assert len(files2) == 4
+    assert len(files2.difference(files)) == 1
+    assert os.stat("test.pdf").st_mtime_ns != mtime
+
+
+def test_streamed_svg_export(test_env):
+    slides = test_env.slides
+    slide = slides.new_slide()
+    slide.box().text("Hello")
+    slide.box(width=100).image(test_env.assets_path("test.png"))
+    unit = slides.render(None, return_units=True)[0]
+
+    path = unit.export(slides.fs_cache, "pdf")
+    assert os.path.isfile(path)
+
+    def constructor(*args):
+        raise Exception("Export should be cached")
+
+    # Chunks of the document are hashed in the same way as the whole document
+    assert slides.fs_cache.ensure(unit.export_svg.encode(), "pdf", constructor) == path
@@ -1,8 +1,12 @@
 import pytest
-from conftest import check
+from conftest import SlideTester, check
 
 import elsie
 from elsie import TextStyle
+from elsie.render.backends import CairoBackend
+from elsie.render.backends.backend import TextQuery
+from elsie.render.backends.querystore import QueryCache, QueryStore, query_digest
+from elsie.render.backends.svg.backend import InkscapeBackend
 from elsie.text.highlight import highlight_code
 from elsie.text.textparser import (
     extract_line,
@@ -62,7 +66,8 @@ int ~#A{main}() {}
     printf("Hello ~emph{world!\\n");}
     return 0;
 }""",
-    use_styles=True)
+        use_styles=True,
+    )
 
 
 @check("styles-highlight")
@@ -620,4 +625,213 @@ def test_rotated_text(test_env):
 
     slide.box(x=100, y=100).text("Hello world!", rotation=90)
     slide.box(x=100, y=300).text("Hello world!", rotation=180)
-    slide.box(x=100, y=500).code("Python", "a = 5", rotation=45)
\ No newline at end of file
+    slide.box(x=100, y=500).code("Python", "a = 5", rotation=45)
+
+
+def test_batched_text_queries(test_env):
+    slides = test_env.slides
+    backend = slides.backend
+    style = slides.get_style("default", full_style=True)
+
+    texts = ["A", "Hello world", "A"]
+    queries = [
+        TextQuery("width", parse_text(text), style, slides._styles) for text in texts
+    ]
+    assert all(query.value is None for query in queries)
+
+    backend.resolve_queries(queries)
+    assert queries[0].value == queries[2].value
+    assert queries[1].value > queries[0].value
+    assert queries[1].value == backend.compute_text_width(
+        parse_text("Hello world"), style, slides._styles
+    )
+
+
+def test_lazy_text_queries(test_env):
+    slides = test_env.slides
+    slide1 = slides.new_slide()
+    slide1.box().text("First")
+    slide2 = slides.new_slide()
+    slide2.box().text("Second ~tt{slide}").inline_box("tt").rect(color="red")
+    assert len(slide2.slide.pending_queries) == 3
+
+    slides.render(output=None, return_units=True, select_slides=[slide2.slide])
+    assert len(slide1.slide.pending_queries) == 1
+    assert not slide2.slide.pending_queries
+
+
+def test_select_slides_keeps_queries(test_env, inkscape_shell):
+    def render(select):
+        backend = InkscapeBackend(inkscape=inkscape_shell, cache_dir="qcache")
+        slides = SlideTester(backend).slides
+        slide1 = slides.new_slide()
+        slide1.text("First")
+        slides.new_slide().text("Second")
+        slides.render(
+            output=None,
+            return_units=True,
+            select_slides=[slide1.slide] if select else None,
+        )
+        return len(backend.query_cache)
+
+    assert render(False) == 2
+    render(True)
+    # Measurements of the slide that was not rendered are still stored
+    store = InkscapeBackend(inkscape=inkscape_shell, cache_dir="qcache").query_store
+    assert store.connection.execute("SELECT COUNT(*) FROM queries").fetchone()[0] == 2
+
+
+def test_parallel_text_queries(test_env, inkscape_shell):
+    backend = InkscapeBackend(inkscape=inkscape_shell, workers=3)
+    slides = test_env.slides
+    style = slides.get_style("default", full_style=True)
+    texts = [f"Text {'x' * i}" for i in range(10)] + ["Text x", "Text"]
+
+    try:
+        queries = [
+            TextQuery(method, parse_text(text), style, slides._styles)
+            for text in texts
+            for method in ("width", "x")
+        ]
+        backend.resolve_queries(queries)
+        assert len(backend.query_cache) == 22
+        assert len(backend.inkscape_pool.shells) <= 3
+        for query in queries:
+            compute = getattr(slides.backend, f"compute_text_{query.method}")
+            assert query.value == compute(query.parsed_text, query.style, query.styles)
+    finally:
+        backend.inkscape_pool.close()
+
+
+def test_cairo_text_extents_cache(test_env):
+    styles = test_env.slides._styles
+    style = test_env.slides.get_style("default", full_style=True)
+    big_style = style.copy()
+    big_style.size *= 2
+
+    def create_backend():
+        backend = CairoBackend(cache_dir="ecache")
+        backend.set_dimensions(1024, 768)
+        return backend
+
+    backend = create_backend()
+    width = backend.compute_text_width(parse_text("Hello ~tt{world}"), style, styles)
+    height = backend.compute_text_height(
+        parse_text("Hello ~tt{world}"), style.copy(), styles
+    )
+    assert width > 0 and height > 0
+    # A single measurement answers all queries of the text
+    assert len(backend.query_cache) == 3
+    assert backend.query_cache.hits == 1
+    big_width = backend.compute_text_width(
+        parse_text("Hello ~tt{world}"), big_style, styles
+    )
+    assert big_width > width
+    backend.prune_cache()
+    backend.save_cache()
+
+    backend = create_backend()
+    assert (
+        backend.compute_text_width(parse_text("Hello ~tt{world}"), style, styles)
+        == width
+    )
+    assert backend._measure_ctx is None
+    backend.prune_cache()
+    backend.save_cache()
+
+    backend = create_backend()
+    assert (
+        backend.compute_text_width(parse_text("Hello ~tt{world}"), big_style, styles)
+        == big_width
+    )
+    assert backend._measure_ctx is not None
+
+
+def test_query_store(test_env, inkscape_shell):
+    style = test_env.slides.get_style("default", full_style=True)
+
+    def resolve(texts):
+        backend = InkscapeBackend(inkscape=inkscape_shell, cache_dir="qcache")
+        queries = [
+            TextQuery("width", parse_text(text), style, test_env.slides._styles)
+            for text in texts
+        ]
+        backend.resolve_queries(queries)
+        computed = len(backend.query_store.pending)
+        backend.prune_cache()
+        backend.save_cache()
+        return [query.value for query in queries], computed
+
+    values, computed = resolve(["A", "BB"])
+    assert computed == 2
+    assert resolve(["A", "BB"]) == (values, 0)
+
+    values2, computed = resolve(["BB", "CCC"])
+    assert values2[0] == values[1]
+    assert computed == 1
+    assert resolve(["A"])[1] == 1
+
+
+def test_query_store_prune(test_env):
+    def count():
+        return store.connection.execute("SELECT COUNT(*) FROM queries").fetchone()[0]
+
+    def no_removal(_used_keys):
+        raise Exception("Nothing should be removed")
+
+    store = QueryStore("queries.db", {"version": "1"})
+    store._remove_unused = no_removal
+    store.add(b"a", 1.0)
+    store.add(b"b", 2.0)
+    store.prune([b"a", b"b"])
+    assert count() == 0
+    store.flush()
+    assert count() == 2
+
+    # Entries that are already stored are not counted again
+    store.add(b"a", 1.0)
+    store.prune([b"a", b"b"])
+    store.flush()
+    assert store.count == 2
+    del store._remove_unused
+
+    # Nothing is removed from the disk before the store is flushed
+    store.prune([b"a"])
+    assert count() == 2
+    store.flush()
+    assert count() == store.count == 1
+    assert store.get_many([b"a", b"b"]) == {b"a": 1.0}
+    store.close()
+
+    store = QueryStore("queries.db", {"version": "1"})
+    assert store.count == 1
+    store._remove_unused = no_removal
+    store.prune([b"a"])
+    store.flush()
+    store.close()
+
+
+def test_query_cache_stats(test_env):
+    backend = test_env.slides.backend
+    backend.query_cache = QueryCache()
+    style = test_env.slides.get_style("default", full_style=True)
+    data = backend._text_query_data(
+        parse_text("A"), style, test_env.slides._styles, None
+    )
+
+    assert backend.process_queries([("inkscape-w", data), ("inkscape-w", data)])
+    assert backend.process_queries([("inkscape-w", data), ("inkscape-h", data)])
+    stats = backend.query_cache.stats()
+    assert stats["entries"] == 2
+    assert (stats["hits"], stats["misses"]) == (1, 3)
+    assert stats["hit_rate"] == 0.25
+    assert stats["memory"] > 0
+
+    # Entries with a colliding digest are not returned
+    digest = query_digest("inkscape-w", data)
+    assert backend.query_cache.get(digest, "inkscape-w", data + " ") is None
+
+    backend.query_cache.prune()
+    assert len(backend.query_cache) == 2
+    backend.query_cache.prune()
+    assert len(backend.query_cache) == 0
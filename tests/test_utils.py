@@ -1,3 +1,4 @@
+import io
 import os
 import re
 import sys
@@ -8,6 +9,7 @@ import pytest
 from PIL import Image, ImageChops, ImageStat
 
 from elsie.render.backends import CairoBackend, InkscapeBackend
+from elsie.utils.sxml import Xml
 
 numbers_split = re.compile(r"(-?[\d.]+)")
 
@@ -201,3 +203,26 @@ def check_cairo_pdf(wrapped, inkscape_shell, diff_threshold, *args, **kwargs):
 def check_cairo(wrapped, inkscape_shell, diff_threshold, *args, **kwargs):
     check_cairo_png(wrapped, inkscape_shell, diff_threshold, *args, **kwargs)
     check_cairo_pdf(wrapped, inkscape_shell, diff_threshold, *args, **kwargs)
+
+
+def test_xml_writer():
+    xml = Xml()
+    xml.element("svg")
+    xml.set("width", 10.5)
+    xml.set("height", 7)
+    xml.set("style", "font-family:'a&b'")
+    xml.element("text")
+    xml.text("x < y & z")
+    xml.close("text")
+    xml.element("rect")
+    xml.close("rect")
+    xml.close("svg")
+
+    expected = (
+        "<svg width='10.5' height='7' style='font-family:&apos;a&amp;b&apos;'>"
+        "<text>x&#160;&lt;&#160;y&#160;&amp;&#160;z</text><rect /></svg>"
+    )
+    assert xml.to_string() == expected
+    stream = io.StringIO()
+    xml.write_to(stream)
+    assert stream.getvalue() == expected